@@ -0,0 +1,63 @@
+"""
+Cross-month analytics computed server-side with MongoDB aggregation pipelines.
+
+Only the stored monthly summaries are aggregated; raw daily rows never leave
+the database.
+"""
+
+from daily_records import month_range_filter, format_hours_hm
+
+SUMMARY_TOTAL_FIELDS = ('total_hours', 'present_days', 'absent_days', 'auto_assigned_days')
+
+
+def range_totals_pipeline(user_id, start, end):
+    """Per-employee totals over every stored month from `start` to `end`."""
+    match = {'user_id': user_id}
+    match.update(month_range_filter(start, end))
+
+    group = {
+        '_id': '$monthly_summary.employee_id',
+        'employee_name': {'$last': '$monthly_summary.employee_name'},
+        'months': {'$sum': 1},
+    }
+    for field in SUMMARY_TOTAL_FIELDS:
+        group[field] = {'$sum': f'$monthly_summary.{field}'}
+
+    return [
+        {'$match': match},
+        {'$project': {'year': 1, 'month': 1, 'monthly_summary': 1}},
+        {'$sort': {'year': 1, 'month': 1}},
+        {'$unwind': '$monthly_summary'},
+        {'$group': group},
+        {'$sort': {'_id': 1}},
+    ]
+
+
+def range_totals(db, user_id, start, end):
+    employees = []
+    for row in db.attendance_reports.aggregate(range_totals_pipeline(user_id, start, end)):
+        row['employee_id'] = row.pop('_id')
+        row['total_hours_hm'] = format_hours_hm(row.get('total_hours') or 0)
+        employees.append(row)
+
+    match = {'user_id': user_id}
+    match.update(month_range_filter(start, end))
+    months = [
+        {'year': d['year'], 'month': d['month']}
+        for d in db.attendance_reports.find(match, {'_id': 0, 'year': 1, 'month': 1}).sort([('year', 1), ('month', 1)])
+    ]
+
+    overall = {field: sum(e.get(field) or 0 for e in employees) for field in SUMMARY_TOTAL_FIELDS}
+    overall['total_hours_hm'] = format_hours_hm(overall['total_hours'])
+    overall['employees'] = len(employees)
+    overall['months'] = len(months)
+    worked = overall['present_days'] + overall['absent_days']
+    overall['attendance_rate'] = float(overall['present_days'] / worked * 100) if worked else 0.0
+
+    return {
+        'from': {'year': start[0], 'month': start[1]},
+        'to': {'year': end[0], 'month': end[1]},
+        'months': months,
+        'employees': employees,
+        'overall': overall,
+    }
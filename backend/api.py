@@ -4,24 +4,61 @@ Provides REST API endpoints for the React frontend.
 Uses JWT authentication and MongoDB for data storage.
 """
 
-from flask import Flask, request, jsonify, send_file, g
+from flask import Flask, Response, request, jsonify, send_file, g
 from flask_cors import CORS
-from attendance_processor import AttendanceProcessor
-from database import init_db, get_db
-from auth import jwt_required, register_user, login_user, get_user_profile
+from database import init_db, get_db, ping_db, normalize_employee_id
+from auth import jwt_required, jwt_required_stream, register_user, login_user, get_user_profile
+from jobs import jobs, sse_stream
+from report_stats import compute_report_statistics
+from bson import ObjectId
+from bson.errors import InvalidId
+from cache import cache, cached_per_user, invalidates
+from responses import (json_response, fast_json_response, spliced_json_response, dataframe_to_columns,
+                       dumps_fast, make_etag, is_not_modified, not_modified_response, compress_response)
+from daily_records import (replace_daily_records, parse_fields, build_daily_record_query, MAX_QUERY_LIMIT,
+                           summarize_daily_records, parse_year_month, employee_calendar_query,
+                           merge_daily_records, apply_daily_changes, report_row_key)
+from shared_months import shared_months, report_rows_json
+from metrics import init_app as init_metrics, observe_processing
+from db_monitoring import init_app as init_db_monitoring
+from punches import (parse_punch_batch, build_punch_docs, insert_punch_events, load_punches, evaluate_punches,
+                     MAX_PUNCH_BATCH, MAX_EVALUATE_DAYS, MAX_REPORTED_ERRORS)
 import os
+import io
 import json
+import hashlib
 import tempfile
+import threading
 from datetime import datetime
-import pandas as pd
 import logging
 
+# pandas/openpyxl (via attendance_processor) are imported inside the handlers
+# that need them so a cold start can answer /api/health immediately.
+
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 app = Flask(__name__)
 
-init_db()
+# Index creation runs once in the background instead of blocking import.
+# Set DB_INIT_ON_STARTUP=0 when indexes are managed with `python manage.py init-db`.
+_warmup_state = {'status': 'pending', 'error': None}
+
+
+def _warm_up_database():
+    try:
+        init_db()
+        _warmup_state['status'] = 'ok'
+    except Exception as e:
+        logger.warning(f"Database warm-up failed: {str(e)}")
+        _warmup_state['status'] = 'failed'
+        _warmup_state['error'] = str(e)
+
+
+if os.environ.get('DB_INIT_ON_STARTUP', '1') == '1':
+    threading.Thread(target=_warm_up_database, name='db-warmup', daemon=True).start()
+else:
+    _warmup_state['status'] = 'skipped'
 
 ALLOWED_ORIGINS = [
     "https://biometric-blackhole.vercel.app",
@@ -38,6 +75,10 @@ CORS(app,
      methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
      max_age=3600)
 
+app.after_request(compress_response)
+init_metrics(app)
+init_db_monitoring(app)
+
 UPLOAD_FOLDER = tempfile.mkdtemp()
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
@@ -91,12 +132,113 @@ def api_me():
 
 @app.route('/api/health', methods=['GET'])
 def health_check():
+    """Liveness probe: answers without touching the database."""
     return jsonify({"status": "healthy", "message": "API is running"})
 
+
+@app.route('/api/ready', methods=['GET'])
+def readiness_check():
+    """Readiness probe: checks that MongoDB answers a ping."""
+    try:
+        ping_db()
+    except Exception as e:
+        logger.warning(f"Readiness check failed: {str(e)}")
+        return jsonify({"status": "unavailable", "database": "unreachable",
+                        "indexes": _warmup_state['status']}), 503
+    return jsonify({"status": "ready", "database": "ok", "indexes": _warmup_state['status']})
+
 # ---------------------------------------------------------------------------
 # Attendance processing (existing endpoints, now JWT-protected)
 # ---------------------------------------------------------------------------
 
+def _read_process_params():
+    """Processing parameters from the multipart form of /api/process."""
+    selected_dates_str = request.form.get('selected_dates', '[]')
+    try:
+        selected_dates = json.loads(selected_dates_str) if selected_dates_str else []
+    except Exception:
+        selected_dates = []
+
+    return {
+        'year': int(request.form.get('year', datetime.now().year)),
+        'month': int(request.form.get('month', datetime.now().month)),
+        'max_hours': float(request.form.get('max_hours', 8.0)),
+        'selected_dates': selected_dates,
+        'format': request.form.get('format', request.args.get('format', 'rows')),
+    }
+
+
+def _run_process_pipeline(temp_input, params, progress_callback=None):
+    """Run AttendanceProcessor on a saved upload and build the response payload.
+
+    Returns (payload, fast) where `fast` means the payload must be encoded with
+    fast_json_response (columnar numpy arrays).
+    """
+    from attendance_processor import AttendanceProcessor
+
+    year, month, max_hours = params['year'], params['month'], params['max_hours']
+    processor = AttendanceProcessor(max_hours_per_day=max_hours)
+    temp_output = os.path.join(UPLOAD_FOLDER, f"output_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.xlsx")
+
+    daily_report, monthly_summary = processor.process(
+        input_file=temp_input,
+        output_file=temp_output,
+        year=year,
+        month=month,
+        max_hours=max_hours,
+        selected_dates=params['selected_dates'],
+        progress_callback=progress_callback,
+    )
+    observe_processing(processor, daily_report, monthly_summary)
+
+    total_hours = monthly_summary['total_hours'].sum()
+    total_employees = len(monthly_summary)
+    total_records = len(daily_report)
+    present_days = monthly_summary['present_days'].sum()
+    absent_days = monthly_summary['absent_days'].sum()
+    auto_assigned_days = monthly_summary['auto_assigned_days'].sum()
+
+    payload = {
+        "success": True,
+        "statistics": {
+            "total_hours": float(total_hours),
+            "total_employees": total_employees,
+            "total_records": total_records,
+            "present_days": int(present_days),
+            "absent_days": int(absent_days),
+            "auto_assigned_days": int(auto_assigned_days),
+            "avg_hours_per_employee": float(monthly_summary['total_hours'].mean()),
+            "avg_present_days": float(monthly_summary['present_days'].mean())
+        },
+        "stage_timings": {k: round(v, 4) for k, v in processor.stage_timings.items()},
+        "output_file": temp_output,
+        "year": year,
+        "month": month
+    }
+
+    # format=columnar (opt-in): column names once plus one value array per
+    # column, serialized straight from the DataFrames.
+    if params['format'] == 'columnar':
+        payload["report_statistics"] = compute_report_statistics(
+            daily_report[['status']].to_dict('records'), monthly_summary.to_dict('records')
+        )
+        payload["format"] = "columnar"
+        payload["daily_report"] = dataframe_to_columns(daily_report)
+        payload["monthly_summary"] = dataframe_to_columns(monthly_summary)
+        return payload, True
+
+    daily_records = daily_report.to_dict('records')
+    summary_records = monthly_summary.to_dict('records')
+    payload["report_statistics"] = compute_report_statistics(daily_records, summary_records)
+    payload["daily_report"] = daily_records
+    payload["monthly_summary"] = summary_records
+    return payload, False
+
+
+def _process_response(payload, fast):
+    return fast_json_response(payload) if fast else json_response(payload)
+
+
 @app.route('/api/process', methods=['POST'])
 @jwt_required
 def process_attendance():
@@ -108,70 +250,307 @@ def process_attendance():
         if file.filename == '':
             return jsonify({"error": "No file selected"}), 400
 
-        year = int(request.form.get('year', datetime.now().year))
-        month = int(request.form.get('month', datetime.now().month))
-        max_hours = float(request.form.get('max_hours', 8.0))
-
-        selected_dates_str = request.form.get('selected_dates', '[]')
         try:
-            selected_dates = json.loads(selected_dates_str) if selected_dates_str else []
-        except Exception:
-            selected_dates = []
-
-        logger.info(f"Processing file: {file.filename}, Year: {year}, Month: {month}, Max Hours: {max_hours}")
+            params = _read_process_params()
+        except ValueError as e:
+            return jsonify({"error": f"Invalid processing parameters: {str(e)}"}), 400
+        logger.info(f"Processing file: {file.filename}, Year: {params['year']}, "
+                    f"Month: {params['month']}, Max Hours: {params['max_hours']}")
 
-        temp_input = os.path.join(UPLOAD_FOLDER, f"input_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+        temp_input = os.path.join(UPLOAD_FOLDER, f"input_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.xlsx")
         file.save(temp_input)
 
-        processor = AttendanceProcessor(max_hours_per_day=max_hours)
-        temp_output = os.path.join(UPLOAD_FOLDER, f"output_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx")
+        payload, fast = _run_process_pipeline(temp_input, params)
+
+        if os.path.exists(temp_input):
+            os.remove(temp_input)
+
+        return _process_response(payload, fast)
+
+    except Exception as e:
+        logger.error(f"Error processing file: {str(e)}", exc_info=True)
+        if 'temp_input' in locals() and os.path.exists(temp_input):
+            os.remove(temp_input)
+        return jsonify({"error": str(e)}), 500
+
+
+@app.route('/api/process/delta', methods=['POST'])
+@jwt_required
+def process_attendance_delta():
+    """Merge a partial-period export (e.g. one day or week) into the stored month.
+
+    Only employee-days that are new or whose content changed are written to
+    daily_records; the stored report's rows and monthly summary are patched
+    with those days instead of reprocessing the whole month.
+    """
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({"error": "No file provided"}), 400
+
+    file = request.files['file']
+    try:
+        params = _read_process_params()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid processing parameters: {str(e)}"}), 400
+    year, month = params['year'], params['month']
+    temp_input = os.path.join(UPLOAD_FOLDER, f"delta_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.xlsx")
+    try:
+        file.save(temp_input)
+        from attendance_processor import AttendanceProcessor
 
+        processor = AttendanceProcessor(max_hours_per_day=params['max_hours'])
         daily_report, monthly_summary = processor.process(
             input_file=temp_input,
-            output_file=temp_output,
+            output_file=None,
             year=year,
             month=month,
-            max_hours=max_hours,
-            selected_dates=selected_dates
+            max_hours=params['max_hours'],
+            selected_dates=params['selected_dates'],
         )
+        observe_processing(processor, daily_report, monthly_summary)
+    except Exception as e:
+        logger.error(f"Error processing delta file: {str(e)}", exc_info=True)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        if os.path.exists(temp_input):
+            os.remove(temp_input)
 
-        daily_report_json = daily_report.to_dict('records')
-        monthly_summary_json = monthly_summary.to_dict('records')
+    rows = daily_report.to_dict('records')
+    db = get_db()
+    changed, previous = merge_daily_records(db, g.user_id, year, month, rows)
+
+    query = {'user_id': g.user_id, 'year': year, 'month': month}
+    report = db.attendance_reports.find_one(query, {'daily_report': 1, 'monthly_summary': 1}) or {}
+    stored_daily = report.get('daily_report') or []
+    stored_summary = report.get('monthly_summary') or []
+
+    if changed:
+        apply_daily_changes(stored_daily, stored_summary, changed)
+        now = datetime.utcnow().isoformat()
+        db.attendance_reports.update_one(
+            query,
+            {'$set': {
+                'daily_report': stored_daily,
+                'monthly_summary': stored_summary,
+                'report_statistics': compute_report_statistics(stored_daily, stored_summary),
+                'updated_at': now,
+            },
+             '$setOnInsert': {
+                'user_id': g.user_id,
+                'year': year,
+                'month': month,
+                'created_at': now,
+            }},
+            upsert=True,
+        )
+        if shared_months is not None:
+            try:
+                shared_months.publish(g.user_id, year, month, stored_daily, version=now)
+            except Exception as e:
+                logger.warning(f"Could not publish shared month file: {str(e)}")
+
+    logger.info(f"Delta {file.filename} for {year}-{month:02d}: {len(rows)} days received, "
+                f"{len(changed) - len(previous)} new, {len(previous)} updated")
+    return json_response({
+        'success': True,
+        'year': year,
+        'month': month,
+        'received': len(rows),
+        'inserted': len(changed) - len(previous),
+        'updated': len(previous),
+        'unchanged': len(rows) - len(changed),
+        'stage_timings': {k: round(v, 4) for k, v in processor.stage_timings.items()},
+        'monthly_summary': stored_summary,
+    })
 
-        total_hours = monthly_summary['total_hours'].sum()
-        total_employees = len(monthly_summary)
-        total_records = len(daily_report)
-        present_days = monthly_summary['present_days'].sum()
-        absent_days = monthly_summary['absent_days'].sum()
-        auto_assigned_days = monthly_summary['auto_assigned_days'].sum()
 
-        if os.path.exists(temp_input):
-            os.remove(temp_input)
+@app.route('/api/process/jobs', methods=['POST'])
+@jwt_required
+def submit_process_job():
+    """Start processing in the background; progress is streamed over SSE.
+
+    Re-submitting the same file and parameters while that job is running (or
+    recently finished) returns the existing job instead of a duplicate run.
+    """
+    if 'file' not in request.files or request.files['file'].filename == '':
+        return jsonify({"error": "No file provided"}), 400
+
+    file = request.files['file']
+    try:
+        params = _read_process_params()
+    except ValueError as e:
+        return jsonify({"error": f"Invalid processing parameters: {str(e)}"}), 400
+    file_bytes = file.read()
+    fingerprint = hashlib.sha256(
+        file_bytes + json.dumps(params, sort_keys=True).encode()
+    ).hexdigest()
+
+    def run(job):
+        temp_input = os.path.join(UPLOAD_FOLDER, f"job_{job.id}.xlsx")
+        with open(temp_input, 'wb') as f:
+            f.write(file_bytes)
+        try:
+            return _run_process_pipeline(temp_input, params, progress_callback=job.add_event)
+        finally:
+            if os.path.exists(temp_input):
+                os.remove(temp_input)
+
+    job, duplicate = jobs.submit(g.user_id, fingerprint, run)
+    logger.info(f"Process job {job.id} for {file.filename} (duplicate={duplicate})")
+
+    result = job.to_dict()
+    result.update({
+        'duplicate': duplicate,
+        'events_url': f"/api/process/jobs/{job.id}/events",
+        'result_url': f"/api/process/jobs/{job.id}/result",
+    })
+
+    # preview=N: process the first N employee blocks now and return them with
+    # the job, while the full run carries on in the background.
+    preview_limit = request.form.get('preview', type=int)
+    if preview_limit:
+        try:
+            result['preview'] = _build_preview(file_bytes, params, min(preview_limit, MAX_PREVIEW_EMPLOYEES))
+        except Exception as e:
+            logger.warning(f"Preview failed for job {job.id}: {str(e)}")
+            result['preview'] = {'error': str(e)}
+
+    return fast_json_response(result, status=200 if duplicate else 202)
+
+
+MAX_PREVIEW_EMPLOYEES = 200
+
+
+def _build_preview(file_bytes, params, limit):
+    from attendance_processor import AttendanceProcessor
+
+    processor = AttendanceProcessor(max_hours_per_day=params['max_hours'])
+    daily_report, monthly_summary = processor.preview(
+        io.BytesIO(file_bytes),
+        year=params['year'],
+        month=params['month'],
+        max_hours=params['max_hours'],
+        selected_dates=params['selected_dates'],
+        limit=limit,
+    )
+    return {
+        'employees': len(monthly_summary),
+        'daily_report': daily_report.to_dict('records'),
+        'monthly_summary': monthly_summary.to_dict('records'),
+    }
+
+
+@app.route('/api/process/jobs/<job_id>', methods=['GET'])
+@jwt_required
+def get_process_job(job_id):
+    job = jobs.get(job_id, g.user_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    result = job.to_dict()
+    if job.status == 'succeeded':
+        result['stage_timings'] = job.result[0].get('stage_timings', {})
+    return jsonify(result)
+
+
+@app.route('/api/process/jobs/<job_id>/events', methods=['GET'])
+@jwt_required_stream
+def stream_process_job_events(job_id):
+    """Server-Sent Events: one `progress` event per stage/employee block, then `done`."""
+    job = jobs.get(job_id, g.user_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return Response(
+        sse_stream(job, request.headers.get('Last-Event-ID')),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
+
+
+@app.route('/api/process/jobs/<job_id>/result', methods=['GET'])
+@jwt_required
+def get_process_job_result(job_id):
+    job = jobs.get(job_id, g.user_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    if job.status == 'failed':
+        return jsonify({"error": job.error}), 500
+    if not job.done:
+        return jsonify(job.to_dict()), 409
+    payload, fast = job.result
+    return _process_response(payload, fast)
+
+
+def _parse_scenarios(raw):
+    """Validate the scenarios form field; raises ValueError with a client message."""
+    try:
+        scenarios = json.loads(raw or '[]')
+    except ValueError:
+        raise ValueError("scenarios must be a JSON list")
+    if not isinstance(scenarios, list):
+        raise ValueError("scenarios must be a JSON list")
+    if not scenarios:
+        return [{'name': f"{h:g}h", 'max_hours': h} for h in (8.0, 10.0, 12.0, 14.0)]
+
+    for index, sc in enumerate(scenarios):
+        if not isinstance(sc, dict):
+            raise ValueError(f"Scenario {index} must be an object")
+        if 'max_hours' not in sc:
+            raise ValueError("Every scenario needs max_hours")
+        try:
+            sc['max_hours'] = float(sc['max_hours'])
+        except (TypeError, ValueError):
+            raise ValueError(f"Scenario {index}: max_hours must be a number")
+        selected_dates = sc.get('selected_dates') or []
+        if not isinstance(selected_dates, list) or not all(isinstance(d, str) for d in selected_dates):
+            raise ValueError(f"Scenario {index}: selected_dates must be a list of YYYY-MM-DD strings")
+        if sc.get('name') is not None and not isinstance(sc['name'], str):
+            raise ValueError(f"Scenario {index}: name must be a string")
+
+    from attendance_processor import scenario_names
+    for sc, name in zip(scenarios, scenario_names(scenarios)):
+        sc['name'] = name
+    return scenarios
+
+
+@app.route('/api/process/scenarios', methods=['POST'])
+@jwt_required
+def process_scenarios():
+    """Compare several max_hours / selected_dates scenarios on one parse.
+
+    Form fields: file, year, month and scenarios, a JSON list of
+    {"name", "max_hours", "selected_dates"} (default: the 8/10/12/14h profiles).
+    """
+    temp_input = None
+    try:
+        if 'file' not in request.files or request.files['file'].filename == '':
+            return jsonify({"error": "No file provided"}), 400
+        file = request.files['file']
+
+        try:
+            year = int(request.form.get('year', datetime.now().year))
+            month = int(request.form.get('month', datetime.now().month))
+            scenarios = _parse_scenarios(request.form.get('scenarios'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
-        return jsonify({
+        temp_input = os.path.join(UPLOAD_FOLDER, f"scenarios_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.xlsx")
+        file.save(temp_input)
+
+        from attendance_processor import AttendanceProcessor
+
+        df_scenarios, df_deltas = AttendanceProcessor().compare_scenarios(temp_input, year, month, scenarios)
+        return fast_json_response({
             "success": True,
-            "daily_report": daily_report_json,
-            "monthly_summary": monthly_summary_json,
-            "statistics": {
-                "total_hours": float(total_hours),
-                "total_employees": total_employees,
-                "total_records": total_records,
-                "present_days": int(present_days),
-                "absent_days": int(absent_days),
-                "auto_assigned_days": int(auto_assigned_days),
-                "avg_hours_per_employee": float(monthly_summary['total_hours'].mean()),
-                "avg_present_days": float(monthly_summary['present_days'].mean())
-            },
-            "output_file": temp_output,
             "year": year,
-            "month": month
+            "month": month,
+            "scenarios": df_scenarios.to_dict('records'),
+            "employee_deltas": dataframe_to_columns(df_deltas),
         })
-
     except Exception as e:
-        logger.error(f"Error processing file: {str(e)}", exc_info=True)
-        if 'temp_input' in locals() and os.path.exists(temp_input):
-            os.remove(temp_input)
+        logger.error(f"Error evaluating scenarios: {str(e)}", exc_info=True)
         return jsonify({"error": str(e)}), 500
+    finally:
+        if temp_input and os.path.exists(temp_input):
+            os.remove(temp_input)
 
 
 @app.route('/api/download', methods=['GET'])
@@ -197,31 +576,130 @@ def download_file():
         return jsonify({"error": str(e)}), 500
 
 
+# Statistics are materialized on the report document when it is saved, so
+# these endpoints only look them up instead of accepting the report back.
+MAX_STATISTICS_BODY_BYTES = 4096
+
+
+def _stored_report_statistics(db, doc):
+    """Return a report's materialized statistics, computing them for older reports."""
+    stats = doc.get('report_statistics')
+    if stats is None:
+        full = db.attendance_reports.find_one({'_id': doc['_id']}, {'daily_report': 1, 'monthly_summary': 1})
+        stats = compute_report_statistics(full.get('daily_report'), full.get('monthly_summary'))
+        db.attendance_reports.update_one({'_id': doc['_id']}, {'$set': {'report_statistics': stats}})
+    return stats
+
+
+@app.route('/api/statistics/<report_id>', methods=['GET'])
+@jwt_required
+def get_report_statistics(report_id):
+    try:
+        oid = ObjectId(report_id)
+    except (InvalidId, TypeError):
+        return jsonify({"error": "Invalid report id"}), 400
+
+    db = get_db()
+    doc = db.attendance_reports.find_one(
+        {'_id': oid, 'user_id': g.user_id},
+        {'report_statistics': 1, 'updated_at': 1},
+    )
+    if not doc:
+        return jsonify({"error": "Report not found"}), 404
+    return json_response(_stored_report_statistics(db, doc),
+                         etag=make_etag('stats', doc['_id'], doc.get('updated_at')))
+
+
 @app.route('/api/statistics', methods=['POST'])
+@jwt_required
 def get_statistics():
+    """Look up statistics by {"year", "month"}; report bodies are no longer accepted."""
+    if (request.content_length or 0) > MAX_STATISTICS_BODY_BYTES:
+        return jsonify({"error": "Send {year, month} or use GET /api/statistics/<report_id>"}), 413
+
+    data = request.get_json(silent=True) or {}
+    year, month = data.get('year'), data.get('month')
+    if not year or not month:
+        return jsonify({"error": "year and month are required"}), 400
+
+    db = get_db()
+    doc = db.attendance_reports.find_one(
+        {'user_id': g.user_id, 'year': year, 'month': month},
+        {'report_statistics': 1},
+    )
+    if not doc:
+        return jsonify({"error": "Report not found"}), 404
+    return jsonify(_stored_report_statistics(db, doc))
+
+
+@app.route('/api/payroll/compute', methods=['GET', 'POST'])
+@jwt_required
+def compute_payroll_endpoint():
+    """Salaries for a stored month: monthly summary x hour rates, in paise.
+
+    GET returns the computed salaries. POST additionally stores the employees
+    that have a rate as the user's confirmed salaries.
+    """
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    if not year or not month:
+        return jsonify({'error': 'year and month are required'}), 400
+
+    from payroll import compute_payroll
+
+    db = get_db()
+    report = db.attendance_reports.find_one(
+        {'user_id': g.user_id, 'year': year, 'month': month},
+        {'monthly_summary': 1},
+    )
+    if not report:
+        return jsonify({'error': 'No attendance report for this month'}), 404
+    rates = {d['employee_id']: d['hour_rate']
+             for d in db.hour_rates.find({'user_id': g.user_id}, {'employee_id': 1, 'hour_rate': 1})}
+
+    payroll = compute_payroll(report.get('monthly_summary', []), rates)
+    with_rate = payroll[payroll['rate_paise'] > 0]
+
+    if request.method == 'POST':
+        now = datetime.utcnow().isoformat()
+        db.confirmed_salaries.delete_many({'user_id': g.user_id})
+        if not with_rate.empty:
+            db.confirmed_salaries.insert_many([{
+                'user_id': g.user_id,
+                'employee_id': row['employee_id'],
+                'employee_name': row['employee_name'],
+                'total_hours': row['total_hours'],
+                'hour_rate': row['hour_rate'],
+                'salary': row['salary'],
+                'confirmed_at': now,
+                'created_at': now,
+            } for row in with_rate[['employee_id', 'employee_name', 'total_hours', 'hour_rate', 'salary']]
+                .to_dict('records')])
+        cache.invalidate(g.user_id, 'confirmed_salaries')
+
+    return fast_json_response({
+        'year': year,
+        'month': month,
+        'employees': payroll.to_dict('records'),
+        'employees_with_rate': int(len(with_rate)),
+        'total_salary_paise': int(with_rate['salary_paise'].sum()),
+        'total_salary': int(with_rate['salary_paise'].sum()) / 100,
+        'persisted': request.method == 'POST',
+    })
+
+@app.route('/api/analytics/range', methods=['GET'])
+@jwt_required
+def analytics_range():
+    """Per-employee and overall totals for from=YYYY-MM to=YYYY-MM (inclusive)."""
+    from analytics import range_totals
+
     try:
-        data = request.json
-        daily_report = pd.DataFrame(data.get('daily_report', []))
-        monthly_summary = pd.DataFrame(data.get('monthly_summary', []))
-
-        if daily_report.empty or monthly_summary.empty:
-            return jsonify({"error": "No data provided"}), 400
-
-        stats = {
-            "top_performer": monthly_summary.loc[monthly_summary['total_hours'].idxmax()].to_dict(),
-            "attendance_rate": float((monthly_summary['present_days'].sum() /
-                                     (monthly_summary['present_days'].sum() + monthly_summary['absent_days'].sum())) * 100),
-            "hours_distribution": {
-                "min": float(monthly_summary['total_hours'].min()),
-                "max": float(monthly_summary['total_hours'].max()),
-                "mean": float(monthly_summary['total_hours'].mean()),
-                "median": float(monthly_summary['total_hours'].median())
-            }
-        }
-        return jsonify(stats)
-    except Exception as e:
-        logger.error(f"Error calculating statistics: {str(e)}")
-        return jsonify({"error": str(e)}), 500
+        start = parse_year_month(request.args.get('from'))
+        end = parse_year_month(request.args.get('to') or request.args.get('from'))
+        result = range_totals(get_db(), g.user_id, start, end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return json_response(result)
 
 # ---------------------------------------------------------------------------
 # Data CRUD endpoints (MongoDB)
@@ -238,13 +716,18 @@ def save_attendance_report():
 
     db = get_db()
     now = datetime.utcnow().isoformat()
+    # Stored in daily_records order, the order the shared month file uses.
+    daily_report = sorted(data.get('daily_report', []), key=report_row_key)
 
     db.attendance_reports.update_one(
         {'user_id': g.user_id, 'year': data.get('year'), 'month': data.get('month')},
         {'$set': {
-            'daily_report': data.get('daily_report', []),
+            'daily_report': daily_report,
             'monthly_summary': data.get('monthly_summary', []),
             'statistics': data.get('statistics', {}),
+            'report_statistics': compute_report_statistics(
+                daily_report, data.get('monthly_summary', [])
+            ),
             'output_file': data.get('output_file'),
             'updated_at': now,
         },
@@ -256,6 +739,12 @@ def save_attendance_report():
         }},
         upsert=True,
     )
+    replace_daily_records(db, g.user_id, data.get('year'), data.get('month'), daily_report)
+    if shared_months is not None and data.get('year') and data.get('month'):
+        try:
+            shared_months.publish(g.user_id, data['year'], data['month'], daily_report, version=now)
+        except Exception as e:
+            logger.warning(f"Could not publish shared month file: {str(e)}")
     return jsonify({'success': True})
 
 
@@ -268,17 +757,25 @@ def get_attendance_report():
     db = get_db()
 
     if year and month:
-        doc = db.attendance_reports.find_one(
-            {'user_id': g.user_id, 'year': year, 'month': month}
-        )
+        query = {'user_id': g.user_id, 'year': year, 'month': month}
+        # Check the validator before pulling the (large) daily_report.
+        doc = db.attendance_reports.find_one(query, {'daily_report': 0})
         if not doc:
             return jsonify(None)
-        return jsonify(_report_doc_to_dict(doc))
+        etag = make_etag('report', doc['_id'], doc.get('updated_at'))
+        if is_not_modified(etag):
+            return not_modified_response(etag)
+
+        doc, daily_report = _load_daily_report(db, doc)
+        payload = _report_doc_to_dict(doc)
+        del payload['daily_report']
+        return spliced_json_response(payload, {'daily_report': daily_report},
+                                     etag=make_etag('report', doc['_id'], doc.get('updated_at')))
     else:
         docs = db.attendance_reports.find(
             {'user_id': g.user_id}
         ).sort('updated_at', -1)
-        return jsonify([_report_doc_to_dict(d) for d in docs])
+        return json_response([_report_doc_to_dict(d) for d in docs])
 
 
 @app.route('/api/data/last-process-result', methods=['GET'])
@@ -287,19 +784,224 @@ def get_last_process_result():
     db = get_db()
     doc = db.attendance_reports.find_one(
         {'user_id': g.user_id},
+        {'daily_report': 0},
         sort=[('updated_at', -1)],
     )
     if not doc:
         return jsonify(None)
-    return jsonify({
-        'daily_report': doc.get('daily_report', []),
+    etag = make_etag('last', doc['_id'], doc.get('updated_at'))
+    if is_not_modified(etag):
+        return not_modified_response(etag)
+
+    doc, daily_report = _load_daily_report(db, doc)
+    return spliced_json_response({
         'monthly_summary': doc.get('monthly_summary', []),
         'statistics': doc.get('statistics', {}),
         'year': doc.get('year'),
         'month': doc.get('month'),
+    }, {'daily_report': daily_report}, etag=make_etag('last', doc['_id'], doc.get('updated_at')))
+
+
+def _load_daily_report(db, doc):
+    """(doc, daily_report JSON bytes) for a report fetched without daily_report.
+
+    The rows come from the memory-mapped shared month file when it was
+    published for this version of the report; otherwise the full document is
+    read again. Both encode rows the same way, in the same order.
+    """
+    if shared_months is not None and doc.get('year') and doc.get('month'):
+        table = shared_months.open_month(g.user_id, doc['year'], doc['month'], version=doc.get('updated_at'))
+        if table is not None:
+            return doc, report_rows_json(table)
+    doc = db.attendance_reports.find_one({'_id': doc['_id']}) or doc
+    rows = doc.get('daily_report') or []
+    return doc, b'[' + b','.join(dumps_fast(row) for row in rows) + b']'
+
+
+@app.route('/api/punches', methods=['POST'])
+@jwt_required
+def ingest_punches():
+    """Bulk-ingest raw device punches as a JSON array or NDJSON.
+
+    Each event is {"employee_id", "timestamp" (ISO 8601), "device_id"}. Valid
+    events are stored even if others in the batch are rejected.
+    """
+    try:
+        events = parse_punch_batch(request.get_data(), request.content_type)
+    except ValueError as e:
+        return jsonify({'error': f'Invalid body: {str(e)}'}), 400
+    if len(events) > MAX_PUNCH_BATCH:
+        return jsonify({'error': f'At most {MAX_PUNCH_BATCH} events per request'}), 413
+
+    docs, errors = build_punch_docs(g.user_id, events)
+    if not docs and errors:
+        return jsonify({'error': 'No valid events', 'rejected': errors[:MAX_REPORTED_ERRORS]}), 400
+
+    accepted = insert_punch_events(get_db(), docs)
+    return jsonify({
+        'success': True,
+        'accepted': accepted,
+        'rejected_count': len(errors),
+        'rejected': errors[:MAX_REPORTED_ERRORS],
+    })
+
+
+@app.route('/api/punches/report', methods=['GET'])
+@jwt_required
+def punches_report():
+    """Daily report and summary evaluated directly from stored punch events.
+
+    Query args: date_from, date_to (YYYY-MM-DD, inclusive), optional
+    employee_id, max_hours and selected_dates (comma-separated YYYY-MM-DD).
+    """
+    try:
+        date_from = datetime.strptime(request.args.get('date_from', ''), '%Y-%m-%d').date()
+        date_to = datetime.strptime(request.args.get('date_to', ''), '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'error': 'date_from and date_to are required as YYYY-MM-DD'}), 400
+    if date_to < date_from:
+        return jsonify({'error': 'date_to is before date_from'}), 400
+    if (date_to - date_from).days >= MAX_EVALUATE_DAYS:
+        return jsonify({'error': f'Range is limited to {MAX_EVALUATE_DAYS} days'}), 400
+
+    from attendance_processor import AttendanceProcessor
+
+    max_hours = request.args.get('max_hours', 8.0, type=float)
+    selected_dates = [d.strip() for d in request.args.get('selected_dates', '').split(',') if d.strip()]
+    days = load_punches(get_db(), g.user_id, date_from, date_to, request.args.get('employee_id'))
+    daily_report, monthly_summary = evaluate_punches(
+        AttendanceProcessor(max_hours_per_day=max_hours), days, date_from, date_to, selected_dates
+    )
+    return json_response({
+        'date_from': date_from.isoformat(),
+        'date_to': date_to.isoformat(),
+        'daily_report': daily_report.to_dict('records'),
+        'monthly_summary': monthly_summary.to_dict('records'),
+    })
+
+
+@app.route('/api/data/daily-records', methods=['GET'])
+@jwt_required
+def query_daily_records():
+    """Filtered, sorted and paginated daily records for one month."""
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    if not year or not month:
+        return jsonify({'error': 'year and month are required'}), 400
+
+    limit = min(max(request.args.get('limit', 100, type=int), 1), MAX_QUERY_LIMIT)
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    try:
+        query, sort = build_daily_record_query(g.user_id, year, month, request.args)
+        projection = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    db = get_db()
+    total = db.daily_records.count_documents(query)
+    items = list(db.daily_records.find(query, projection).sort(sort).skip(offset).limit(limit))
+
+    return json_response({
+        'total': total,
+        'limit': limit,
+        'offset': offset,
+        'items': items,
     })
 
 
+@app.route('/api/data/daily-records/stream', methods=['GET'])
+@jwt_required
+def stream_daily_records():
+    """Stream one month's daily records as NDJSON straight from a cursor."""
+    year = request.args.get('year', type=int)
+    month = request.args.get('month', type=int)
+    if not year or not month:
+        return jsonify({'error': 'year and month are required'}), 400
+    try:
+        projection = parse_fields(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Prefer the memory-mapped Arrow file shared by all workers, if published.
+    table = shared_months.open_month(g.user_id, year, month) if shared_months is not None else None
+    if table is not None:
+        columns = [f for f in projection if f != '_id' and f in table.column_names]
+        selected = table.select(columns)
+
+        def generate_shared():
+            for batch in selected.to_batches(max_chunksize=500):
+                for row in batch.to_pylist():
+                    if 'employee_id' in row:
+                        row['employee_id'] = normalize_employee_id(row['employee_id'])
+                    yield dumps_fast(row) + b'\n'
+
+        return Response(generate_shared(), mimetype='application/x-ndjson',
+                        headers={'Cache-Control': 'private, no-cache', 'X-Accel-Buffering': 'no'})
+
+    cursor = get_db().daily_records.find(
+        {'user_id': g.user_id, 'year': year, 'month': month},
+        projection,
+        batch_size=500,
+    ).sort([('employee_id', 1), ('date', 1)])
+
+    def generate():
+        try:
+            for doc in cursor:
+                yield dumps_fast(doc) + b'\n'
+        finally:
+            cursor.close()
+
+    return Response(generate(), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'private, no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/api/employees/<employee_id>/calendar', methods=['GET'])
+@jwt_required
+def get_employee_calendar(employee_id):
+    """One employee's day records and summary for a month (year=&month=)
+    or a range of months (from=YYYY-MM&to=YYYY-MM)."""
+    try:
+        if request.args.get('from') or request.args.get('to'):
+            start = parse_year_month(request.args.get('from'))
+            end = parse_year_month(request.args.get('to') or request.args.get('from'))
+        else:
+            year = request.args.get('year', type=int)
+            month = request.args.get('month', type=int)
+            if not year or not month:
+                return jsonify({'error': 'year and month (or from/to) are required'}), 400
+            start = end = (year, month)
+        query, sort = employee_calendar_query(g.user_id, employee_id, start, end)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    emp_id = query['employee_id']
+    projection = parse_fields(None)
+    projection.update({'year': 1, 'month': 1})
+    docs = get_db().daily_records.find(query, projection).sort(sort)
+
+    months = {}
+    employee_name = None
+    for doc in docs:
+        employee_name = employee_name or doc.get('employee_name')
+        months.setdefault((doc.pop('year'), doc.pop('month')), []).append(doc)
+
+    month_entries = [{
+        'year': year,
+        'month': month,
+        'days': days,
+        'summary': summarize_daily_records(days),
+    } for (year, month), days in months.items()]
+
+    result = {'employee_id': emp_id, 'employee_name': employee_name}
+    if start == end:
+        entry = month_entries[0] if month_entries else {'days': [], 'summary': summarize_daily_records([])}
+        result.update({'year': start[0], 'month': start[1], 'days': entry['days'], 'summary': entry['summary']})
+    else:
+        all_days = [day for entry in month_entries for day in entry['days']]
+        result.update({'months': month_entries, 'summary': summarize_daily_records(all_days)})
+    return json_response(result)
+
+
 def _report_doc_to_dict(doc):
     return {
         'id': str(doc['_id']),
@@ -318,6 +1020,7 @@ def _report_doc_to_dict(doc):
 
 @app.route('/api/data/manual-users', methods=['GET'])
 @jwt_required
+@cached_per_user('manual_users')
 def get_manual_users():
     db = get_db()
     docs = db.manual_users.find({'user_id': g.user_id}).sort('created_at', 1)
@@ -349,6 +1052,7 @@ def get_manual_users():
 
 @app.route('/api/data/manual-users', methods=['POST'])
 @jwt_required
+@invalidates('manual_users', 'manual_user_daily_records')
 def save_manual_users():
     users = request.get_json()
     if users is None:
@@ -365,7 +1069,7 @@ def save_manual_users():
 
         db.manual_users.insert_one({
             'user_id': g.user_id,
-            'employee_id': u.get('employee_id'),
+            'employee_id': normalize_employee_id(u.get('employee_id')),
             'employee_name': u.get('employee_name', ''),
             'total_hours': th,
             'hour_rate': float(u['hour_rate']) if u.get('hour_rate') else None,
@@ -382,6 +1086,7 @@ def save_manual_users():
 
 @app.route('/api/data/manual-user-daily-records', methods=['GET'])
 @jwt_required
+@cached_per_user('manual_user_daily_records')
 def get_manual_user_daily_records():
     db = get_db()
     docs = db.manual_users.find(
@@ -398,6 +1103,7 @@ def get_manual_user_daily_records():
 
 @app.route('/api/data/manual-user-daily-records', methods=['POST'])
 @jwt_required
+@invalidates('manual_users', 'manual_user_daily_records')
 def save_manual_user_daily_records():
     daily_records = request.get_json()
     if daily_records is None:
@@ -407,16 +1113,8 @@ def save_manual_user_daily_records():
     now = datetime.utcnow().isoformat()
 
     for emp_id_str, records in daily_records.items():
-        try:
-            emp_id_num = int(emp_id_str)
-        except ValueError:
-            emp_id_num = emp_id_str
-
         db.manual_users.update_one(
-            {'user_id': g.user_id, '$or': [
-                {'employee_id': emp_id_num},
-                {'employee_id': emp_id_str},
-            ]},
+            {'user_id': g.user_id, 'employee_id': normalize_employee_id(emp_id_str)},
             {'$set': {'daily_records': records, 'updated_at': now}},
         )
     return jsonify({'success': True})
@@ -425,6 +1123,7 @@ def save_manual_user_daily_records():
 
 @app.route('/api/data/finalized-salaries', methods=['GET'])
 @jwt_required
+@cached_per_user('finalized_salaries')
 def get_finalized_salaries():
     db = get_db()
     docs = db.finalized_salaries.find(
@@ -445,6 +1144,7 @@ def get_finalized_salaries():
 
 @app.route('/api/data/finalized-salaries', methods=['POST'])
 @jwt_required
+@invalidates('finalized_salaries')
 def save_finalized_salaries():
     data = request.get_json()
     if data is None:
@@ -471,6 +1171,7 @@ def save_finalized_salaries():
 
 @app.route('/api/data/confirmed-salaries', methods=['GET'])
 @jwt_required
+@cached_per_user('confirmed_salaries')
 def get_confirmed_salaries():
     db = get_db()
     docs = db.confirmed_salaries.find(
@@ -489,6 +1190,7 @@ def get_confirmed_salaries():
 
 @app.route('/api/data/confirmed-salaries', methods=['POST'])
 @jwt_required
+@invalidates('confirmed_salaries')
 def save_confirmed_salaries():
     salaries = request.get_json()
     if salaries is None:
@@ -501,7 +1203,7 @@ def save_confirmed_salaries():
     for s in salaries:
         db.confirmed_salaries.insert_one({
             'user_id': g.user_id,
-            'employee_id': s.get('employee_id'),
+            'employee_id': normalize_employee_id(s.get('employee_id')),
             'employee_name': s.get('employee_name'),
             'total_hours': s.get('total_hours'),
             'hour_rate': s.get('hour_rate'),
@@ -515,6 +1217,7 @@ def save_confirmed_salaries():
 
 @app.route('/api/data/hour-rates', methods=['GET'])
 @jwt_required
+@cached_per_user('hour_rates')
 def get_hour_rates():
     db = get_db()
     docs = db.hour_rates.find({'user_id': g.user_id})
@@ -527,6 +1230,7 @@ def get_hour_rates():
 
 @app.route('/api/data/hour-rates', methods=['POST'])
 @jwt_required
+@invalidates('hour_rates')
 def save_hour_rates():
     rates = request.get_json()
     if rates is None:
@@ -536,15 +1240,16 @@ def save_hour_rates():
     now = datetime.utcnow().isoformat()
 
     for emp_id_str, rate in rates.items():
+        emp_id = normalize_employee_id(emp_id_str)
         db.hour_rates.update_one(
-            {'user_id': g.user_id, 'employee_id': int(emp_id_str)},
+            {'user_id': g.user_id, 'employee_id': emp_id},
             {'$set': {
                 'hour_rate': float(rate),
                 'updated_at': now,
             },
              '$setOnInsert': {
                 'user_id': g.user_id,
-                'employee_id': int(emp_id_str),
+                'employee_id': emp_id,
                 'created_at': now,
             }},
             upsert=True,
@@ -556,9 +1261,13 @@ def save_hour_rates():
 
 @app.route('/api/data/clear-all', methods=['POST'])
 @jwt_required
+@invalidates('hour_rates', 'manual_users', 'manual_user_daily_records', 'finalized_salaries', 'confirmed_salaries')
 def clear_all_user_data():
     db = get_db()
     db.attendance_reports.delete_many({'user_id': g.user_id})
+    db.daily_records.delete_many({'user_id': g.user_id})
+    if shared_months is not None:
+        shared_months.remove_user(g.user_id)
     db.manual_users.delete_many({'user_id': g.user_id})
     db.confirmed_salaries.delete_many({'user_id': g.user_id})
     db.finalized_salaries.delete_many({'user_id': g.user_id})
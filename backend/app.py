@@ -6,7 +6,6 @@ Upload biometric attendance files and get instant calculations
 import streamlit as st
 import pandas as pd
 from attendance_processor import AttendanceProcessor
-import os
 from datetime import datetime
 import io
 
@@ -112,116 +111,138 @@ with col2:
     st.write(f"**Standard Hours:** {max_hours} hours/day")
     st.write(f"**Auto-assignment:** Missing punch-outs will be assigned {max_hours} hours")
 
+DAILY_PAGE_SIZES = [25, 50, 100, 250]
+
+
+@st.cache_data(show_spinner=False, max_entries=8)
+def parse_upload(file_bytes: bytes):
+    """Read and extract employee blocks once per distinct upload."""
+    processor = AttendanceProcessor()
+    df_raw = processor.read_attendance_excel(io.BytesIO(file_bytes))
+    return processor.extract_employee_data(df_raw)
+
+
+@st.cache_data(show_spinner=False, max_entries=16)
+def build_reports(file_bytes: bytes, year: int, month: int, max_hours: float):
+    """Daily report, monthly summary and .xlsx bytes for one upload + sidebar setting.
+
+    Cached on the upload bytes and the parameters, so widget changes and reruns
+    reuse the result; changing month or hours reuses the parsed upload.
+    """
+    processor = AttendanceProcessor(max_hours_per_day=max_hours)
+    employees = parse_upload(file_bytes)
+    daily_report, monthly_summary = processor.process_employees(
+        employees,
+        output_file=None,
+        year=year,
+        month=month,
+        max_hours=max_hours
+    )
+    excel_data = processor.to_excel_bytes(daily_report, monthly_summary)
+    return daily_report, monthly_summary, excel_data
+
+
 # Process button
 if uploaded_file is not None:
     st.markdown("---")
-    
+
+    upload_key = (uploaded_file.name, uploaded_file.size)
+    if st.session_state.get("processed_upload") != upload_key:
+        st.session_state["processed_upload"] = None
+
     if st.button("🚀 Process Attendance File", type="primary", use_container_width=True):
-        with st.spinner("Processing attendance data... Please wait..."):
-            try:
-                # Save uploaded file temporarily
-                temp_input_path = f"temp_upload_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-                with open(temp_input_path, "wb") as f:
-                    f.write(uploaded_file.getvalue())
-                
-                # Process the file
-                processor = AttendanceProcessor(max_hours_per_day=max_hours)
-                
-                output_filename = f"Attendance_Report_{month_name}_{year}.xlsx"
-                output_path = os.path.join(os.getcwd(), output_filename)
-                
-                daily_report, monthly_summary = processor.process(
-                    input_file=temp_input_path,
-                    output_file=output_path,
-                    year=year,
-                    month=month,
-                    max_hours=max_hours
+        st.session_state["processed_upload"] = upload_key
+
+    if st.session_state.get("processed_upload") == upload_key:
+        try:
+            with st.spinner("Processing attendance data... Please wait..."):
+                daily_report, monthly_summary, excel_data = build_reports(
+                    uploaded_file.getvalue(), year, month, max_hours
                 )
-                
-                # Clean up temp file
-                os.remove(temp_input_path)
-                
-                # Display success message
-                st.success("✅ Processing completed successfully!")
-                
-                # Display summary metrics
-                st.markdown("### 📊 Processing Summary")
-                
-                col1, col2, col3, col4 = st.columns(4)
-                with col1:
-                    st.metric("Total Records", len(daily_report))
-                with col2:
-                    st.metric("Employees", len(monthly_summary))
-                with col3:
-                    st.metric("Total Hours", f"{monthly_summary['total_hours'].sum():.2f}")
-                with col4:
-                    st.metric("Present Days", monthly_summary['present_days'].sum())
-                
-                # Display monthly summary
-                st.markdown("### 👥 Monthly Summary by Employee")
-                
+            output_filename = f"Attendance_Report_{month_name}_{year}.xlsx"
+
+            # Display success message
+            st.success("✅ Processing completed successfully!")
+
+            # Display summary metrics
+            st.markdown("### 📊 Processing Summary")
+
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.metric("Total Records", len(daily_report))
+            with col2:
+                st.metric("Employees", len(monthly_summary))
+            with col3:
+                st.metric("Total Hours", f"{monthly_summary['total_hours'].sum():.2f}")
+            with col4:
+                st.metric("Present Days", monthly_summary['present_days'].sum())
+
+            summary_tab, daily_tab, stats_tab = st.tabs(
+                ["👥 Monthly Summary", "📅 Daily Records", "📈 Additional Statistics"]
+            )
+
+            with summary_tab:
                 # Format the dataframe for better display
                 display_summary = monthly_summary.copy()
                 display_summary['total_hours'] = display_summary['total_hours'].round(2)
-                
+
                 st.dataframe(
                     display_summary,
                     use_container_width=True,
                     height=400
                 )
-                
-                # Display daily records sample
-                st.markdown("### 📅 Daily Records (Sample - First 20 rows)")
+
+            with daily_tab:
+                page_col, size_col = st.columns([3, 1])
+                with size_col:
+                    page_size = st.selectbox("Rows per page", DAILY_PAGE_SIZES, index=1)
+                page_count = max(1, -(-len(daily_report) // page_size))
+                with page_col:
+                    page = st.number_input(f"Page (1-{page_count})", min_value=1,
+                                           max_value=page_count, value=1, step=1)
+                start = (int(page) - 1) * page_size
+                st.caption(f"Rows {start + 1}-{min(start + page_size, len(daily_report))} of {len(daily_report)}")
                 st.dataframe(
-                    daily_report.head(20),
+                    daily_report.iloc[start:start + page_size],
                     use_container_width=True,
                     height=400
                 )
-                
-                # Download button for the output file
-                st.markdown("### 💾 Download Report")
-                
-                with open(output_path, "rb") as f:
-                    excel_data = f.read()
-                
-                st.download_button(
-                    label="📥 Download Excel Report",
-                    data=excel_data,
-                    file_name=output_filename,
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    type="primary",
-                    use_container_width=True
-                )
-                
-                # Additional statistics
-                st.markdown("### 📈 Additional Statistics")
+
+            with stats_tab:
                 col1, col2, col3 = st.columns(3)
-                
+
                 with col1:
                     st.write("**Attendance Status**")
                     st.write(f"- Total Absent Days: {monthly_summary['absent_days'].sum()}")
                     st.write(f"- Auto-Assigned Cases: {monthly_summary['auto_assigned_days'].sum()}")
-                
+
                 with col2:
                     st.write("**Average Metrics**")
                     avg_hours = monthly_summary['total_hours'].mean()
                     avg_present = monthly_summary['present_days'].mean()
                     st.write(f"- Avg Hours/Employee: {avg_hours:.2f}")
                     st.write(f"- Avg Present Days: {avg_present:.2f}")
-                
+
                 with col3:
                     st.write("**Top Performer**")
                     top_employee = monthly_summary.loc[monthly_summary['total_hours'].idxmax()]
                     st.write(f"- {top_employee['employee_name']}")
                     st.write(f"- {top_employee['total_hours']:.2f} hours")
-                
-            except Exception as e:
-                st.error(f"❌ Error processing file: {str(e)}")
-                st.exception(e)
-                
-                # Clean up temp file if it exists
-                if os.path.exists(temp_input_path):
-                    os.remove(temp_input_path)
+
+            # Download button for the in-memory workbook
+            st.markdown("### 💾 Download Report")
+            st.download_button(
+                label="📥 Download Excel Report",
+                data=excel_data,
+                file_name=output_filename,
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+                type="primary",
+                use_container_width=True
+            )
+
+        except Exception as e:
+            st.error(f"❌ Error processing file: {str(e)}")
+            st.exception(e)
 
 else:
     # Instructions when no file is uploaded
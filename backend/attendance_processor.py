@@ -10,10 +10,14 @@ import pandas as pd
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime, timedelta
+from contextlib import contextmanager
+import io
+import itertools
 import re
+import time
 import logging
 from pathlib import Path
-from typing import Tuple, List, Dict, Optional
+from typing import Tuple, List, Dict, Optional, Callable, Iterator
 
 # Configure logging
 logging.basicConfig(
@@ -23,6 +27,82 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+
+SCENARIO_KEY_COLUMNS = ('employee_id', 'employee_name')
+
+
+def scenario_names(scenarios: List[Dict]) -> List[str]:
+    """
+    Column names for evaluate_scenarios. Unnamed scenarios get
+    "<max_hours>h_<index>", so two of them with the same max_hours and
+    different selected_dates do not collide.
+
+    Raises:
+        ValueError: duplicate names, or names that clash with the key or
+            delta_<name> columns of employee_deltas
+    """
+    names = [str(sc.get('name') or f"{float(sc['max_hours']):g}h_{index}")
+             for index, sc in enumerate(scenarios)]
+    seen = set()
+    for name in names:
+        if name in seen:
+            raise ValueError(f"Duplicate scenario name: {name}")
+        if name in SCENARIO_KEY_COLUMNS:
+            raise ValueError(f"Scenario name {name} is reserved")
+        seen.add(name)
+    for name in names[1:]:
+        if f'delta_{name}' in seen:
+            raise ValueError(f"Scenario name delta_{name} clashes with the delta column of {name}")
+    return names
+
+def _is_blank(value) -> bool:
+    return value is None or (isinstance(value, float) and value != value)
+
+
+def _day_number(value) -> Optional[int]:
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and 1 <= value <= 31 \
+            and float(value).is_integer():
+        return int(value)
+    return None
+
+
+def is_header_row(values) -> bool:
+    """A header row has an "Employee ID"/"Employee Name" cell or at least 5 day numbers.
+
+    Shared by read_attendance_excel and iter_employee_blocks so the full run
+    and the preview pick the same row.
+    """
+    texts = {str(v).strip().lower() for v in values if not _is_blank(v)}
+    if 'employee id' in texts or 'employee name' in texts:
+        return True
+    return sum(1 for v in values if _day_number(v) is not None) >= 5
+
+
+def day_columns(header) -> Dict[int, int]:
+    """{column position: day of month} for the day-number cells of a header row."""
+    return {pos: day for pos, day in ((pos, _day_number(v)) for pos, v in enumerate(header))
+            if day is not None}
+
+
+def parse_id_row(values) -> Optional[Tuple[int, str]]:
+    """(employee_id, employee_name) of an "ID:" row, or None.
+
+    The ID is in column 2 and the name in column 10 (after "Name:" in column 8).
+    """
+    if not values or _is_blank(values[0]) or str(values[0]).strip().upper() != "ID:":
+        return None
+    employee_id = None
+    if len(values) > 2 and not _is_blank(values[2]):
+        try:
+            employee_id = int(float(str(values[2]).strip()))
+        except ValueError:
+            pass
+    employee_name = str(values[10]).strip() if len(values) > 10 and not _is_blank(values[10]) else None
+    if employee_id and employee_name:
+        return employee_id, employee_name
+    return None
+
+
 class AttendanceProcessor:
     """
     Robust attendance processing system for biometric Excel exports.
@@ -40,6 +120,31 @@ class AttendanceProcessor:
         self.daily_data = []
         self.monthly_summary = {}
         self.selected_dates = []  # Dates that should be 8 hours for all employees
+        self.progress_callback = None  # Optional callable(event: dict) for progress reporting
+        self.stage_timings = {}  # Stage name -> seconds, filled by the last run
+
+    PIPELINE_STAGES = ('read', 'extract', 'normalize', 'daily', 'summary', 'export')
+
+    def _report_progress(self, stage: str, event: str, **info):
+        """Send a progress event to the callback, if one is set."""
+        if self.progress_callback is None:
+            return
+        payload = {'stage': stage, 'event': event}
+        payload.update(info)
+        try:
+            self.progress_callback(payload)
+        except Exception as e:
+            logger.warning(f"Progress callback failed: {e}")
+
+    @contextmanager
+    def _stage(self, stage: str):
+        """Time one pipeline stage and report its start and end."""
+        self._report_progress(stage, 'start')
+        started = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - started
+        self.stage_timings[stage] = elapsed
+        self._report_progress(stage, 'end', seconds=round(elapsed, 4))
 
     def parse_time(self, time_str: str) -> Optional[datetime.time]:
         """
@@ -205,24 +310,16 @@ class AttendanceProcessor:
         df_display = df.copy()
         logger.info(f"\nFirst few rows:\n{df_display.head(10)}\n")
 
-        # Find the row containing "Employee ID" or "Employee Name"
+        # Same rule as the streaming reader (iter_employee_blocks)
         header_row = None
-        for idx, row in df.iterrows():
-            row_values = [str(val).strip().lower() if pd.notna(val) else "" for val in row]
-            if "employee id" in row_values or "employee name" in row_values:
+        for idx, row in enumerate(df.itertuples(index=False, name=None)):
+            if is_header_row(row):
                 header_row = idx
                 break
-
         if header_row is None:
-            # Fallback: look for row with numeric values (day numbers)
-            for idx, row in df.iterrows():
-                numeric_count = sum(1 for v in row if isinstance(v, (int, float)) and pd.notna(v) and 1 <= v <= 31)
-                if numeric_count >= 5:  # At least 5 date columns
-                    header_row = idx
-                    break
-
-        if header_row is None:
-            header_row = 3  # Default assumption (row 4 in 0-indexed)
+            logger.warning("No header row found (expected 'Employee ID' / 'Employee Name' "
+                           "or a row of day numbers)")
+            return pd.DataFrame()
 
         logger.info(f"Detected header row: {header_row}")
 
@@ -246,68 +343,98 @@ class AttendanceProcessor:
             List of employee records with normalized format
         """
         employees = []
+        day_positions = day_columns(list(df.columns))
+        rows_list = list(df.itertuples(index=False, name=None))
+
         i = 0
-        rows_list = list(df.iterrows())
-        
         while i < len(rows_list):
-            idx, row = rows_list[i]
-            
-            # Skip empty rows
-            if row.isna().all():
-                i += 1
+            identity = parse_id_row(rows_list[i])
+            if identity is not None and i + 1 < len(rows_list):
+                employee_id, employee_name = identity
+                # Next row contains punch data
+                next_row = rows_list[i + 1]
+                attendance = {day: next_row[pos] for pos, day in day_positions.items()}
+
+                employees.append({
+                    'employee_id': employee_id,
+                    'employee_name': employee_name,
+                    'attendance': attendance
+                })
+
+                logger.info(f"Found employee ID {employee_id}: {employee_name}")
+                self._report_progress('extract', 'employee', employees=len(employees),
+                                      employee_id=employee_id)
+
+                # Skip the punch data row
+                i += 2
                 continue
 
-            # Look for "ID:" pattern in column 0
-            employee_id = None
-            employee_name = None
-            
-            # Check if first column is "ID:"
-            if pd.notna(row.iloc[0]) and str(row.iloc[0]).strip().upper() == "ID:":
-                # ID is typically in column 2 (0-indexed)
-                if len(row) > 2 and pd.notna(row.iloc[2]):
-                    try:
-                        employee_id = int(float(str(row.iloc[2]).strip()))
-                    except:
-                        pass
-                
-                # Name is typically in column 10 after "Name:" in column 8
-                if len(row) > 10 and pd.notna(row.iloc[10]):
-                    employee_name = str(row.iloc[10]).strip()
-                
-                if employee_id and employee_name and i + 1 < len(rows_list):
-                    # Next row contains punch data
-                    next_idx, next_row = rows_list[i + 1]
-                    
-                    # Extract attendance data from the next row (date columns)
-                    attendance = {}
-                    for col in df.columns:
-                        try:
-                            # Try to parse column name as date (1-31 for day of month)
-                            if isinstance(col, (int, float)):
-                                day = int(col)
-                                if 1 <= day <= 31:
-                                    punch_data = next_row[col]
-                                    attendance[day] = punch_data
-                        except (ValueError, TypeError):
-                            continue
-                    
-                    employees.append({
-                        'employee_id': employee_id,
-                        'employee_name': employee_name,
-                        'attendance': attendance
-                    })
-                    
-                    logger.info(f"Found employee ID {employee_id}: {employee_name}")
-                    
-                    # Skip the punch data row
-                    i += 2
-                    continue
-            
             i += 1
 
         logger.info(f"Extracted {len(employees)} employees")
         return employees
 
+    def iter_employee_blocks(self, file_path) -> Iterator[Dict]:
+        """
+        Stream employee records straight from the workbook, row by row.
+
+        Yields the same records as extract_employee_data, but reads the sheet
+        with openpyxl in read-only mode, so the first blocks are available
+        before the rest of the file has been parsed. Header and ID rows are
+        recognised by the same helpers as the full reader.
+
+        Args:
+            file_path: Path to Excel file (or a binary file-like object)
+
+        Yields:
+            {'employee_id', 'employee_name', 'attendance'} dicts
+        """
+        wb = openpyxl.load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            day_positions = None
+            pending = None  # (employee_id, employee_name) waiting for its punch row
+
+            for row in ws.iter_rows(values_only=True):
+                if day_positions is None:
+                    if is_header_row(row):
+                        day_positions = day_columns(row)
+                    continue
+
+                if pending is not None:
+                    employee_id, employee_name = pending
+                    pending = None
+                    yield {
+                        'employee_id': employee_id,
+                        'employee_name': employee_name,
+                        'attendance': {
+                            day: (row[pos] if pos < len(row) and row[pos] is not None else float('nan'))
+                            for pos, day in day_positions.items()
+                        },
+                    }
+                    continue
+
+                pending = parse_id_row(row)
+        finally:
+            wb.close()
+
+    def preview(self, input_file, year: int, month: int, max_hours: float = 8.0,
+                selected_dates: List[str] = None, limit: int = 20) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Process only the first `limit` employee blocks, without Excel export.
+
+        The cost depends on `limit`, not on the size of the file.
+
+        Returns:
+            Tuple of (daily_report, monthly_summary) for those employees
+        """
+        employees = list(itertools.islice(self.iter_employee_blocks(input_file), limit))
+        logger.info(f"Preview: {len(employees)} employee block(s)")
+        if not employees:
+            empty = pd.DataFrame()
+            return empty, empty
+        return self.process_employees(employees, None, year, month, max_hours, selected_dates)
+
     def normalize_data(self, employees: List[Dict], year: int, month: int) -> pd.DataFrame:
         """
         Convert wide format (dates as columns) to long format (normalized).
@@ -352,9 +479,18 @@ class AttendanceProcessor:
         """
         daily_records = []
 
+        total_rows = len(df_normalized)
+        last_emp_id = None
+        employees_done = 0
         for idx, row in df_normalized.iterrows():
             emp_id = row['employee_id']
             emp_name = row['employee_name']
+            if emp_id != last_emp_id:
+                if last_emp_id is not None:
+                    employees_done += 1
+                    self._report_progress('daily', 'employee', employees=employees_done,
+                                          rows=len(daily_records), total_rows=total_rows)
+                last_emp_id = emp_id
             date = row['date']
             punch_data = row['raw_punch_data']
 
@@ -468,18 +604,40 @@ class AttendanceProcessor:
             # Write monthly summary
             df_summary.to_excel(writer, sheet_name='Monthly Summary', index=False)
 
-        # Format Excel file
-        self._format_excel(output_path)
+            # Format the workbook before it is saved (no reload from disk)
+            self._format_workbook(writer.book)
+
         logger.info("Export completed successfully")
 
+    def to_excel_bytes(self, df_daily: pd.DataFrame, df_summary: pd.DataFrame) -> bytes:
+        """
+        Build the formatted Excel report in memory.
+
+        Returns:
+            The .xlsx file contents
+        """
+        buffer = io.BytesIO()
+        self.export_to_excel(df_daily, df_summary, buffer)
+        return buffer.getvalue()
+
     def _format_excel(self, file_path: str):
         """
-        Apply professional formatting to Excel output.
+        Apply professional formatting to an Excel file on disk.
 
         Args:
             file_path: Path to Excel file
         """
         wb = openpyxl.load_workbook(file_path)
+        self._format_workbook(wb)
+        wb.save(file_path)
+
+    def _format_workbook(self, wb):
+        """
+        Apply professional formatting to an open workbook.
+
+        Args:
+            wb: openpyxl Workbook
+        """
 
         # Define styles
         header_fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
@@ -522,20 +680,167 @@ class AttendanceProcessor:
                 adjusted_width = min(max_length + 2, 50)
                 ws.column_dimensions[col_letter].width = adjusted_width
 
-        wb.save(file_path)
+    def prepare_punches(self, input_file: str, year: int, month: int) -> pd.DataFrame:
+        """
+        Read and parse a file once into per-day punch facts that do not depend
+        on max_hours or selected dates.
+
+        Args:
+            input_file: Path to input Excel file
+            year: Year (e.g., 2025)
+            month: Month (e.g., 12)
+
+        Returns:
+            DataFrame with employee_id, employee_name, date, date_str,
+            punch_count, punches, worked_hours (0 where hours are auto-assigned),
+            needs_auto_hours, is_absent and base_status
+        """
+        df_raw = self.read_attendance_excel(input_file)
+        employees = self.extract_employee_data(df_raw)
+        df_normalized = self.normalize_data(employees, year, month)
+
+        records = []
+        for row in df_normalized.itertuples(index=False):
+            timestamps = self.parse_punch_data(row.raw_punch_data)
+            worked_hours, status, punch_info = self.process_punch_logic(timestamps)
+            needs_auto = status != "Present" and status != "Absent"
+            records.append({
+                'employee_id': row.employee_id,
+                'employee_name': row.employee_name,
+                'date': row.date,
+                'date_str': row.date.strftime('%Y-%m-%d'),
+                'punch_count': len(timestamps),
+                'punches': punch_info,
+                'worked_hours': 0.0 if needs_auto else worked_hours,
+                'needs_auto_hours': needs_auto,
+                'is_absent': status == "Absent",
+                'base_status': status,
+            })
+
+        return pd.DataFrame(records)
+
+    def evaluate_scenarios(self, prepared: pd.DataFrame,
+                           scenarios: List[Dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Evaluate several max_hours / selected_dates scenarios over one parse.
+
+        The auto-assignment rules are broadcast across a scenario axis: a
+        (days x scenarios) hours matrix is built with NumPy and summed per
+        employee in a single groupby.
+
+        Args:
+            prepared: Output of prepare_punches
+            scenarios: [{'name': str, 'max_hours': float, 'selected_dates': [YYYY-MM-DD, ...]}, ...]
+
+        Returns:
+            Tuple of (scenario_summary, employee_deltas). employee_deltas has one
+            total_hours column per scenario plus delta_<name> columns against
+            the first scenario.
+        """
+        import numpy as np
+
+        names = scenario_names(scenarios)
+        max_hours = np.array([float(sc['max_hours']) for sc in scenarios])
+
+        needs_auto = prepared['needs_auto_hours'].to_numpy()[:, None]
+        absent = prepared['is_absent'].to_numpy()[:, None]
+        selected = np.column_stack([
+            prepared['date_str'].isin(set(sc.get('selected_dates') or [])).to_numpy()
+            for sc in scenarios
+        ]) & absent
+
+        hours = np.where(needs_auto | selected, max_hours[None, :],
+                         prepared['worked_hours'].to_numpy()[:, None])
+        absent_days = absent & ~selected
+        auto_days = needs_auto | selected
+        present_days = (prepared['base_status'] == "Present").to_numpy()
+
+        keys = prepared[['employee_id', 'employee_name']]
+        per_employee_hours = pd.DataFrame(hours, columns=names).groupby(
+            [keys['employee_id'], keys['employee_name']]).sum()
+
+        summary_records = []
+        for i, name in enumerate(names):
+            summary_records.append({
+                'scenario': name,
+                'max_hours': float(max_hours[i]),
+                'selected_dates': len(scenarios[i].get('selected_dates') or []),
+                'employees': int(len(per_employee_hours)),
+                'total_hours': float(hours[:, i].sum()),
+                'present_days': int(present_days.sum()),
+                'absent_days': int(absent_days[:, i].sum()),
+                'auto_assigned_days': int(auto_days[:, i].sum()),
+            })
+        df_scenarios = pd.DataFrame(summary_records)
+
+        df_deltas = per_employee_hours.reset_index()
+        baseline = names[0]
+        for name in names[1:]:
+            df_deltas[f'delta_{name}'] = df_deltas[name] - df_deltas[baseline]
+        df_deltas = df_deltas.sort_values('employee_id').reset_index(drop=True)
+
+        logger.info(f"Evaluated {len(names)} scenarios over {len(prepared)} daily records")
+        return df_scenarios, df_deltas
+
+    def compare_scenarios(self, input_file: str, year: int, month: int,
+                          scenarios: List[Dict]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Parse `input_file` once and evaluate every scenario over it.
+
+        Returns:
+            Tuple of (scenario_summary, employee_deltas); see evaluate_scenarios
+        """
+        prepared = self.prepare_punches(input_file, year, month)
+        return self.evaluate_scenarios(prepared, scenarios)
 
     def process(self, input_file: str, output_file: str, year: int, month: int, 
-                max_hours: float = 8.0, selected_dates: List[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+                max_hours: float = 8.0, selected_dates: List[str] = None,
+                progress_callback: Optional[Callable[[Dict], None]] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
         """
         Main processing pipeline.
 
         Args:
-            input_file: Path to input Excel file
-            output_file: Path to output Excel file
+            input_file: Path to input Excel file (or a binary file-like object)
+            output_file: Path to output Excel file (or a writable binary buffer);
+                None skips the Excel export
             year: Year (e.g., 2025)
             month: Month (e.g., 12)
             max_hours: Maximum hours per day (default 8.0)
             selected_dates: List of dates (YYYY-MM-DD) that should be 8 hours for all employees
+            progress_callback: Optional callable receiving progress events, e.g.
+                {'stage': 'read', 'event': 'start'}, {'stage': 'daily', 'event': 'employee',
+                'employees': 12, ...} and {'stage': 'read', 'event': 'end', 'seconds': 0.41}
+
+        Returns:
+            Tuple of (daily_report, monthly_summary)
+        """
+        if progress_callback is not None:
+            self.progress_callback = progress_callback
+        self.stage_timings = {}
+
+        # Step 1: Read Excel
+        with self._stage('read'):
+            df_raw = self.read_attendance_excel(input_file)
+
+        # Step 2: Extract employee data
+        with self._stage('extract'):
+            employees = self.extract_employee_data(df_raw)
+
+        return self.process_employees(employees, output_file, year, month, max_hours, selected_dates)
+
+    def process_employees(self, employees: List[Dict], output_file, year: int, month: int,
+                          max_hours: float = 8.0,
+                          selected_dates: List[str] = None) -> Tuple[pd.DataFrame, pd.DataFrame]:
+        """
+        Run the pipeline from already-extracted employee records (steps 3-6).
+
+        Lets callers that cache extract_employee_data output re-run a different
+        month or hours setting without re-reading the Excel file.
+
+        Args:
+            employees: Output of extract_employee_data
+            output_file: Output path or binary buffer; None skips the Excel export
+            year, month, max_hours, selected_dates: As for process()
 
         Returns:
             Tuple of (daily_report, monthly_summary)
@@ -548,25 +853,25 @@ class AttendanceProcessor:
         if self.selected_dates:
             logger.info(f"Selected dates (8 hours for all): {self.selected_dates}")
 
-        # Step 1: Read Excel
-        df_raw = self.read_attendance_excel(input_file)
-
-        # Step 2: Extract employee data
-        employees = self.extract_employee_data(df_raw)
-
         # Step 3: Normalize to long format
-        df_normalized = self.normalize_data(employees, year, month)
+        with self._stage('normalize'):
+            df_normalized = self.normalize_data(employees, year, month)
 
         # Step 4: Generate daily report
-        df_daily = self.generate_daily_report(df_normalized)
+        with self._stage('daily'):
+            df_daily = self.generate_daily_report(df_normalized)
 
         # Step 5: Generate monthly summary
-        df_summary = self.generate_monthly_summary(df_daily)
+        with self._stage('summary'):
+            df_summary = self.generate_monthly_summary(df_daily)
 
         # Step 6: Export to Excel
-        self.export_to_excel(df_daily, df_summary, output_file)
+        if output_file is not None:
+            with self._stage('export'):
+                self.export_to_excel(df_daily, df_summary, output_file)
 
-        logger.info("Processing completed successfully")
+        timings = ", ".join(f"{k}={v:.3f}s" for k, v in self.stage_timings.items())
+        logger.info(f"Processing completed successfully ({timings})")
         return df_daily, df_summary
 
 
@@ -6,12 +6,17 @@ Uses MongoDB for user storage.
 
 import jwt
 import hashlib
+import json
 import os
+import threading
 from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify, g
 from bson import ObjectId
+from pymongo import ASCENDING
+from pymongo.errors import DuplicateKeyError
 from database import get_db
+from cache import profile_cache
 
 SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'change-this-secret-in-production-use-a-long-random-string')
 TOKEN_EXPIRY_HOURS = int(os.environ.get('JWT_EXPIRY_HOURS', '72'))
@@ -22,6 +27,25 @@ def hash_password(password):
     return hashlib.sha256(f"{salt}{password}".encode()).hexdigest()
 
 
+_email_index_ready = False
+_email_index_lock = threading.Lock()
+
+
+def _ensure_email_index(db):
+    """Create the unique users.email index once per process.
+
+    register_user relies on it to reject duplicates, and init_db may run in
+    the background or not at all (DB_INIT_ON_STARTUP=0).
+    """
+    global _email_index_ready
+    if _email_index_ready:
+        return
+    with _email_index_lock:
+        if not _email_index_ready:
+            db.users.create_index([('email', ASCENDING)], unique=True)
+            _email_index_ready = True
+
+
 def create_token(user_id, email, role):
     payload = {
         'user_id': str(user_id),
@@ -37,7 +61,7 @@ def decode_token(token):
     return jwt.decode(token, SECRET_KEY, algorithms=['HS256'])
 
 
-def jwt_required(f):
+def jwt_required(f, allow_query_token=False):
     """Decorator that requires a valid JWT token in the Authorization header."""
     @wraps(f)
     def decorated(*args, **kwargs):
@@ -45,6 +69,8 @@ def jwt_required(f):
         auth_header = request.headers.get('Authorization', '')
         if auth_header.startswith('Bearer '):
             token = auth_header[7:]
+        elif allow_query_token:
+            token = request.args.get('access_token')
 
         if not token:
             return jsonify({'error': 'Authentication token is missing'}), 401
@@ -63,6 +89,12 @@ def jwt_required(f):
     return decorated
 
 
+def jwt_required_stream(f):
+    """Like jwt_required, but also accepts ?access_token= for EventSource
+    clients, which cannot set an Authorization header."""
+    return jwt_required(f, allow_query_token=True)
+
+
 def _user_doc_to_dict(doc):
     """Convert a MongoDB user document to a JSON-safe dict."""
     return {
@@ -87,31 +119,31 @@ def register_user(email, password, full_name, role='employee'):
         role = 'admin'
 
     db = get_db()
+    now = datetime.utcnow().isoformat()
+    user_doc = {
+        'email': email_lower,
+        'password_hash': hash_password(password),
+        'full_name': full_name.strip(),
+        'role': role,
+        'created_at': now,
+        'updated_at': now,
+    }
     try:
-        existing = db.users.find_one({'email': email_lower})
-        if existing:
-            return None, 'An account with this email already exists'
-
-        now = datetime.utcnow().isoformat()
-        result = db.users.insert_one({
-            'email': email_lower,
-            'password_hash': hash_password(password),
-            'full_name': full_name.strip(),
-            'role': role,
-            'created_at': now,
-            'updated_at': now,
-        })
-
-        user_doc = db.users.find_one({'_id': result.inserted_id})
-        token = create_token(user_doc['_id'], email_lower, role)
-
-        return {
-            'token': token,
-            'user': _user_doc_to_dict(user_doc),
-        }, None
+        # The unique email index rejects duplicates; no existence check needed.
+        _ensure_email_index(db)
+        user_doc['_id'] = db.users.insert_one(user_doc).inserted_id
+    except DuplicateKeyError:
+        return None, 'An account with this email already exists'
     except Exception as e:
         return None, str(e)
 
+    user = _user_doc_to_dict(user_doc)
+    _cache_profile(user)
+    return {
+        'token': create_token(user_doc['_id'], email_lower, role),
+        'user': user,
+    }, None
+
 
 def login_user(email, password):
     if not email or not password:
@@ -127,18 +159,35 @@ def login_user(email, password):
         return None, 'Invalid email or password'
 
     token = create_token(user_doc['_id'], user_doc['email'], user_doc['role'])
+    user = _user_doc_to_dict(user_doc)
+    _cache_profile(user)
     return {
         'token': token,
-        'user': _user_doc_to_dict(user_doc),
+        'user': user,
     }, None
 
 
+# No endpoint changes a user document yet; one that does must call
+# profile_cache.invalidate(user_id, 'profile') after its write.
+def _cache_profile(user, generation=None):
+    if generation is None:
+        generation = profile_cache.generation(user['id'], 'profile')
+    profile_cache.set(user['id'], 'profile', generation, json.dumps(user).encode())
+
+
 def get_user_profile(user_id):
+    generation = profile_cache.generation(user_id, 'profile')
+    cached = profile_cache.get(user_id, 'profile', generation)
+    if cached is not None:
+        return json.loads(cached)
+
     db = get_db()
     try:
-        user_doc = db.users.find_one({'_id': ObjectId(user_id)})
+        user_doc = db.users.find_one({'_id': ObjectId(user_id)}, {'password_hash': 0})
     except Exception:
         return None
     if not user_doc:
         return None
-    return _user_doc_to_dict(user_doc)
+    user = _user_doc_to_dict(user_doc)
+    _cache_profile(user, generation)
+    return user
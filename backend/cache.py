@@ -0,0 +1,184 @@
+"""
+Per-user response cache for the read-mostly /api/data/* endpoints.
+
+Entries are keyed by (user_id, endpoint, generation). The POST handlers that
+change the underlying data bump the generation instead of deleting entries: a
+GET that read the old generation before the write stores its (possibly stale)
+response under that old key, where no later request looks. The backend is
+chosen from the environment:
+
+    CACHE_URL unset        -> in-process TTL/LRU cache (one per worker)
+    CACHE_URL=redis://...  -> shared Redis-compatible server (all workers)
+    CACHE_URL=none         -> caching disabled
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+from flask import Response, g
+
+from metrics import CACHE_REQUESTS
+
+CACHE_URL = os.environ.get('CACHE_URL', '')
+CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', '300'))
+CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '2048'))
+CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'attendance')
+PROFILE_CACHE_TTL_SECONDS = int(os.environ.get('PROFILE_CACHE_TTL_SECONDS', '60'))
+
+
+class MemoryBackend:
+    """Thread-safe TTL + LRU mapping local to this process."""
+
+    def __init__(self, ttl=CACHE_TTL_SECONDS, max_entries=CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        # Generations are never evicted: losing one would revive old entries.
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+
+
+class RedisBackend:
+    """Shares entries between worker processes through a Redis-compatible server."""
+
+    def __init__(self, url, ttl=CACHE_TTL_SECONDS):
+        import redis
+
+        self.ttl = ttl
+        self._client = redis.Redis.from_url(url)
+
+    def get(self, key):
+        return self._client.get(key)
+
+    def set(self, key, value):
+        self._client.setex(key, self.ttl, value)
+
+    def counter(self, key):
+        return int(self._client.get(key) or 0)
+
+    def incr(self, key):
+        self._client.incr(key)
+
+
+class NullBackend:
+    def get(self, key):
+        return None
+
+    def set(self, key, value):
+        pass
+
+    def counter(self, key):
+        return 0
+
+    def incr(self, key):
+        pass
+
+
+class ResponseCache:
+    """Stores serialized JSON responses per (user_id, endpoint, generation).
+
+    Readers take the generation before reading the database and pass it to
+    get() and set(); writers call invalidate() once their write is done.
+    """
+
+    def __init__(self, backend, name='response'):
+        self.backend = backend
+        self.name = name
+
+    @staticmethod
+    def key(user_id, endpoint, generation):
+        return f"{CACHE_KEY_PREFIX}:{user_id}:{endpoint}:{generation}"
+
+    @staticmethod
+    def generation_key(user_id, endpoint):
+        return f"{CACHE_KEY_PREFIX}:{user_id}:{endpoint}:gen"
+
+    def generation(self, user_id, endpoint):
+        return self.backend.counter(self.generation_key(user_id, endpoint))
+
+    def get(self, user_id, endpoint, generation):
+        value = self.backend.get(self.key(user_id, endpoint, generation))
+        CACHE_REQUESTS.inc(cache=self.name, result='miss' if value is None else 'hit')
+        return value
+
+    def set(self, user_id, endpoint, generation, body):
+        self.backend.set(self.key(user_id, endpoint, generation), body)
+
+    def invalidate(self, user_id, *endpoints):
+        for endpoint in endpoints:
+            self.backend.incr(self.generation_key(user_id, endpoint))
+
+
+def _create_backend(ttl=CACHE_TTL_SECONDS):
+    if CACHE_URL.lower() == 'none':
+        return NullBackend()
+    if CACHE_URL:
+        return RedisBackend(CACHE_URL, ttl=ttl)
+    return MemoryBackend(ttl=ttl)
+
+
+cache = ResponseCache(_create_backend())
+
+# Short-lived user profiles for /api/auth/me (see auth.get_user_profile).
+profile_cache = ResponseCache(_create_backend(ttl=PROFILE_CACHE_TTL_SECONDS), name='profile')
+
+
+def cached_per_user(endpoint):
+    """Serve a JWT-protected GET handler from the cache; store its 200 responses."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            generation = cache.generation(g.user_id, endpoint)
+            body = cache.get(g.user_id, endpoint, generation)
+            if body is not None:
+                return Response(body, mimetype='application/json')
+
+            response = f(*args, **kwargs)
+            if isinstance(response, Response) and response.status_code == 200:
+                cache.set(g.user_id, endpoint, generation, response.get_data())
+            return response
+        return decorated
+    return decorator
+
+
+def invalidates(*endpoints):
+    """Invalidate the caller's cached entries for `endpoints` after a write handler runs."""
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            try:
+                return f(*args, **kwargs)
+            finally:
+                cache.invalidate(g.user_id, *endpoints)
+        return decorated
+    return decorator
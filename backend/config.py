@@ -147,6 +147,18 @@ class ProcessingProfile:
         )
 
 
+    @staticmethod
+    def compare(input_file: str, year: int, month: int, max_hours_options=(8.0, 10.0, 12.0, 14.0),
+                selected_dates=None):
+        """Compare hour profiles on one parse of the file (no Excel output)."""
+        processor = AttendanceProcessor()
+        scenarios = [
+            {'name': f"{hours:g}h", 'max_hours': hours, 'selected_dates': selected_dates or []}
+            for hours in max_hours_options
+        ]
+        return processor.compare_scenarios(input_file, year, month, scenarios)
+
+
 # ============================================================================
 # USAGE FUNCTIONS (Ready-to-use templates)
 # ============================================================================
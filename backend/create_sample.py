@@ -3,10 +3,24 @@ Generate sample attendance Excel file for testing.
 This mimics the typical biometric export format.
 """
 
+import calendar
+import random
+
 import openpyxl
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from datetime import datetime
 
+# Typical punch patterns of a device export cell, with rough weights.
+DEVICE_PUNCH_PATTERNS = [
+    ("09:30 18:15", 30),               # Normal day
+    ("09:05 13:00 13:45 18:30", 15),   # Lunch break punches
+    ("10:10 19:00", 10),               # Late in, late out
+    ("08:55 12:30", 8),                # Half day
+    ("09:40", 5),                      # Single punch
+    ("09:15 09:16 18:05", 5),          # Double tap at the door
+    ("", 27),                          # Absent / weekend
+]
+
 def create_sample_attendance_file(output_path: str):
     """
     Create a sample attendance Excel file matching the specified format.
@@ -107,6 +121,38 @@ def create_sample_attendance_file(output_path: str):
     wb.save(output_path)
     print(f"✓ Sample attendance file created: {output_path}")
 
+def create_device_export(output, employees: int = 50, year: int = None, month: int = None,
+                         seed: int = None):
+    """
+    Create a synthetic device export in the "ID:" / "Name:" block layout that
+    AttendanceProcessor reads: a row of day numbers, then for every employee an
+    ID row followed by a row of punch cells.
+
+    Args:
+        output: Output path or binary file-like object
+        employees: Number of employees to generate
+        year, month: Month covered by the export (default: current month)
+        seed: Random seed, for reproducible files
+    """
+    now = datetime.now()
+    year, month = year or now.year, month or now.month
+    days = calendar.monthrange(year, month)[1]
+    rng = random.Random(seed)
+    patterns, weights = zip(*DEVICE_PUNCH_PATTERNS)
+
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "Att.log report"
+    ws.append(["Attendance Record Report"])
+    ws.append(list(range(1, days + 1)))
+    for index in range(employees):
+        id_row = [None] * 11
+        id_row[0], id_row[2], id_row[8], id_row[10] = "ID:", index + 1, "Name:", f"Employee {index + 1}"
+        ws.append(id_row)
+        ws.append([rng.choices(patterns, weights)[0] or None for _ in range(days)])
+    wb.save(output)
+
+
 if __name__ == "__main__":
     sample_file = r"C:\Users\A\Desktop\Biometric\sample_attendance.xlsx"
     create_sample_attendance_file(sample_file)
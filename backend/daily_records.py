@@ -0,0 +1,350 @@
+"""
+Per-day attendance rows stored one document per (employee, date).
+
+attendance_reports keeps the whole month as a single document. The rows are
+also written to the daily_records collection so they can be streamed, filtered
+and looked up per employee through indexes instead of loading the full report.
+"""
+
+import hashlib
+import re
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+from pymongo import UpdateOne
+
+from database import normalize_employee_id
+
+# Fields a client may request through a `fields=` projection.
+DAILY_RECORD_FIELDS = (
+    'employee_id', 'employee_name', 'date', 'punch_count', 'punches',
+    'worked_hours', 'hours_hm', 'status',
+)
+
+# Fields whose values decide whether a stored day has changed.
+HASHED_FIELDS = ('employee_name', 'punch_count', 'punches', 'worked_hours', 'status')
+
+
+def normalize_record_date(value):
+    """Return a YYYY-MM-DD string for ISO dates, datetimes or HTTP-date strings."""
+    if value is None:
+        return None
+    if hasattr(value, 'strftime'):
+        return value.strftime('%Y-%m-%d')
+    text = str(value).strip()
+    try:
+        return datetime.strptime(text[:10], '%Y-%m-%d').strftime('%Y-%m-%d')
+    except ValueError:
+        pass
+    try:
+        # Flask serializes date objects as RFC 822 strings ("Mon, 01 Dec 2025 00:00:00 GMT")
+        return parsedate_to_datetime(text).strftime('%Y-%m-%d')
+    except (TypeError, ValueError):
+        return text
+
+
+def record_content_hash(row):
+    """Stable hash of one employee-day's content (see HASHED_FIELDS)."""
+    parts = []
+    for field in HASHED_FIELDS:
+        value = row.get(field)
+        if field == 'worked_hours':
+            value = f"{float(value or 0):.6f}"
+        parts.append('' if value is None else str(value))
+    return hashlib.sha1('\x1f'.join(parts).encode('utf-8')).hexdigest()
+
+
+def build_daily_record_docs(user_id, year, month, daily_report):
+    docs = []
+    for row in daily_report:
+        doc = {field: row.get(field) for field in DAILY_RECORD_FIELDS}
+        doc['employee_id'] = normalize_employee_id(doc['employee_id'])
+        doc['date'] = normalize_record_date(doc['date'])
+        doc['name_key'] = (doc['employee_name'] or '').strip().lower()
+        doc['user_id'] = user_id
+        doc['year'] = year
+        doc['month'] = month
+        doc['content_hash'] = record_content_hash(doc)
+        docs.append(doc)
+    return docs
+
+
+def replace_daily_records(db, user_id, year, month, daily_report):
+    """Rewrite the stored rows of one report month and return the documents."""
+    db.daily_records.delete_many({'user_id': user_id, 'year': year, 'month': month})
+    docs = build_daily_record_docs(user_id, year, month, daily_report)
+    if docs:
+        db.daily_records.insert_many(docs, ordered=False)
+    return docs
+
+
+def stored_days_filter(user_id, year, month, dates):
+    """Filter for the stored rows of the given dates of one month."""
+    return {'user_id': user_id, 'year': year, 'month': month, 'date': {'$in': sorted(dates)}}
+
+
+def merge_daily_records(db, user_id, year, month, daily_report):
+    """Upsert only the new or changed employee-days of a partial-period export.
+
+    Rows are keyed by (employee_id, date) and compared by content_hash, so only
+    the days covered by `daily_report` are read and only differing ones are
+    written.
+
+    Returns:
+        (changed, previous): the documents written, and the stored version of
+        each one that replaced an existing day, keyed by (employee_id, date)
+    """
+    docs = {(d['employee_id'], d['date']): d
+            for d in build_daily_record_docs(user_id, year, month, daily_report)}
+    if not docs:
+        return [], {}
+
+    projection = {field: 1 for field in HASHED_FIELDS}
+    projection.update({'_id': 0, 'employee_id': 1, 'date': 1, 'content_hash': 1})
+    stored = {
+        (d['employee_id'], d['date']): d
+        for d in db.daily_records.find(
+            stored_days_filter(user_id, year, month, {date for _, date in docs}),
+            projection,
+        )
+    }
+
+    changed, previous = [], {}
+    for key, doc in docs.items():
+        old = stored.get(key)
+        if old is not None:
+            # Rows written before content hashes existed are hashed on the fly.
+            if (old.get('content_hash') or record_content_hash(old)) == doc['content_hash']:
+                continue
+            previous[key] = old
+        changed.append(doc)
+
+    if changed:
+        db.daily_records.bulk_write([
+            UpdateOne(
+                {'user_id': user_id, 'employee_id': doc['employee_id'], 'year': year,
+                 'month': month, 'date': doc['date']},
+                {'$set': doc},
+                upsert=True,
+            )
+            for doc in changed
+        ], ordered=False)
+    return changed, previous
+
+
+def _summary_contribution(row):
+    status = row.get('status') or ''
+    return {
+        'present_days': int(status == 'Present'),
+        'absent_days': int(status == 'Absent'),
+        'auto_assigned_days': int(any(m in status for m in AUTO_ASSIGNED_MARKERS)),
+        'total_hours': float(row.get('worked_hours') or 0),
+    }
+
+
+def apply_daily_changes(daily_report, monthly_summary, changed):
+    """Patch a stored month's daily_report and monthly_summary in place.
+
+    Each summary total moves by the changed day's contribution minus that of
+    the report row it replaces, so the month is never re-summarized from
+    scratch. The replaced row is taken from daily_report itself, not from
+    daily_records, which may be empty for reports saved before it existed.
+
+    Every row's date is rewritten as YYYY-MM-DD, the form of the patched rows,
+    so a report never mixes it with the HTTP-date strings the UI saved.
+    """
+    for row in daily_report:
+        row['date'] = normalize_record_date(row.get('date'))
+    positions = {
+        (normalize_employee_id(r.get('employee_id')), r['date']): i
+        for i, r in enumerate(daily_report)
+    }
+    summaries = {normalize_employee_id(s.get('employee_id')): s for s in monthly_summary}
+    added_employees = False
+
+    for doc in changed:
+        key = (doc['employee_id'], doc['date'])
+        row = {field: doc[field] for field in DAILY_RECORD_FIELDS}
+        replaced = None
+        if key in positions:
+            replaced = daily_report[positions[key]]
+            daily_report[positions[key]] = row
+        else:
+            positions[key] = len(daily_report)
+            daily_report.append(row)
+
+        summary = summaries.get(doc['employee_id'])
+        if summary is None:
+            summary = {'employee_id': doc['employee_id'], 'employee_name': doc['employee_name'],
+                       'present_days': 0, 'absent_days': 0, 'auto_assigned_days': 0, 'total_hours': 0.0}
+            summaries[doc['employee_id']] = summary
+            monthly_summary.append(summary)
+            added_employees = True
+
+        delta = _summary_contribution(doc)
+        if replaced is not None:
+            for field, value in _summary_contribution(replaced).items():
+                delta[field] -= value
+        for field, value in delta.items():
+            summary[field] = (summary.get(field) or 0) + value
+        summary['total_hours_hm'] = format_hours_hm(summary['total_hours'])
+
+    # Reports saved before rows were kept in report_row_key order are sorted
+    # here too, so the stored month matches its shared month file.
+    daily_report.sort(key=report_row_key)
+    if added_employees:
+        monthly_summary.sort(key=lambda s: _employee_sort_key(s.get('employee_id')))
+    return daily_report, monthly_summary
+
+
+def _employee_sort_key(employee_id):
+    # Same order as a MongoDB sort on employee_id: null, numbers, strings.
+    employee_id = normalize_employee_id(employee_id)
+    if employee_id is None:
+        return (0, '')
+    return (2, employee_id) if isinstance(employee_id, str) else (1, employee_id)
+
+
+def report_row_key(row):
+    """Sort key of a daily_report row: the (employee_id, date) order of daily_records."""
+    return _employee_sort_key(row.get('employee_id')), normalize_record_date(row.get('date')) or ''
+
+
+def parse_fields(fields_param):
+    """Turn a comma-separated `fields=` value into a MongoDB projection."""
+    if not fields_param:
+        fields = DAILY_RECORD_FIELDS
+    else:
+        requested = [f.strip() for f in fields_param.split(',') if f.strip()]
+        unknown = [f for f in requested if f not in DAILY_RECORD_FIELDS]
+        if unknown:
+            raise ValueError(f"Unknown field(s): {', '.join(unknown)}")
+        fields = requested
+    projection = {f: 1 for f in fields}
+    projection['_id'] = 0
+    return projection
+
+
+# Sort keys accepted by the query endpoint; each is backed by an index whose
+# prefix is (user_id, year, month).
+SORT_FIELDS = {
+    'date': 'date',
+    'employee_id': 'employee_id',
+    'employee_name': 'name_key',
+    'worked_hours': 'worked_hours',
+}
+MAX_QUERY_LIMIT = 1000
+
+
+def build_daily_record_query(user_id, year, month, args):
+    """Translate query-string filters into (filter, sort) for daily_records.
+
+    Supported args: employee_id, status (comma-separated), date_from, date_to
+    (YYYY-MM-DD, inclusive), name (case-insensitive prefix) and
+    sort=field or sort=-field.
+    """
+    query = {'user_id': user_id, 'year': year, 'month': month}
+
+    employee_id = args.get('employee_id')
+    if employee_id:
+        query['employee_id'] = normalize_employee_id(employee_id)
+
+    status = args.get('status')
+    if status:
+        statuses = [s.strip() for s in status.split(',') if s.strip()]
+        query['status'] = statuses[0] if len(statuses) == 1 else {'$in': statuses}
+
+    date_range = {}
+    if args.get('date_from'):
+        date_range['$gte'] = normalize_record_date(args['date_from'])
+    if args.get('date_to'):
+        date_range['$lte'] = normalize_record_date(args['date_to'])
+    if date_range:
+        query['date'] = date_range
+
+    name = (args.get('name') or '').strip().lower()
+    if name:
+        # Anchored, case-sensitive regex on the lowercased key -> index range scan.
+        query['name_key'] = {'$regex': '^' + re.escape(name)}
+
+    sort_param = args.get('sort') or 'date'
+    direction = -1 if sort_param.startswith('-') else 1
+    sort_key = sort_param.lstrip('-')
+    if sort_key not in SORT_FIELDS:
+        raise ValueError(f"Unsupported sort field: {sort_key}")
+    sort = [(SORT_FIELDS[sort_key], direction)]
+    if sort_key != 'date':
+        # Same direction as the primary key so the compound index can serve it.
+        sort.append(('date', direction))
+
+    return query, sort
+
+
+AUTO_ASSIGNED_MARKERS = ('Auto Assigned', 'System Assigned', 'Admin Assigned')
+
+
+def format_hours_hm(hours):
+    """Decimal hours -> "HH:MM", matching AttendanceProcessor.time_to_decimal."""
+    hours_int = int(hours)
+    minutes = int((hours - hours_int) * 60)
+    return f"{hours_int:02d}:{minutes:02d}"
+
+
+def summarize_daily_records(records):
+    """Monthly-summary style totals over a list of daily record dicts."""
+    statuses = [r.get('status') or '' for r in records]
+    total_hours = sum(float(r.get('worked_hours') or 0) for r in records)
+    return {
+        'present_days': sum(1 for s in statuses if s == 'Present'),
+        'absent_days': sum(1 for s in statuses if s == 'Absent'),
+        'auto_assigned_days': sum(1 for s in statuses if any(m in s for m in AUTO_ASSIGNED_MARKERS)),
+        'total_hours': total_hours,
+        'total_hours_hm': format_hours_hm(total_hours),
+    }
+
+
+def parse_year_month(value):
+    """Parse "YYYY-MM" into (year, month)."""
+    try:
+        year, month = (int(part) for part in value.split('-', 1))
+    except (AttributeError, ValueError):
+        raise ValueError(f"Expected YYYY-MM, got {value!r}")
+    if not 1 <= month <= 12:
+        raise ValueError(f"Month out of range in {value!r}")
+    return year, month
+
+
+def month_range_filter(start, end):
+    """Index-friendly filter for every (year, month) from `start` to `end` inclusive.
+
+    `start` and `end` are (year, month) tuples. The result is an $or of at most
+    three equality/range branches on (year, month), each of which can seek on
+    an index that has year and month next to each other.
+    """
+    (y0, m0), (y1, m1) = start, end
+    if (y0, m0) > (y1, m1):
+        raise ValueError('Range start is after range end')
+    if y0 == y1:
+        return {'year': y0, 'month': {'$gte': m0, '$lte': m1}}
+    branches = [{'year': y0, 'month': {'$gte': m0}}]
+    if y1 - y0 > 1:
+        branches.append({'year': {'$gt': y0, '$lt': y1}})
+    branches.append({'year': y1, 'month': {'$lte': m1}})
+    return {'$or': branches}
+
+
+def employee_calendar_query(user_id, employee_id, start, end):
+    """(filter, sort) for one employee's days from month `start` to `end`."""
+    query = {'user_id': user_id, 'employee_id': normalize_employee_id(employee_id)}
+    query.update(month_range_filter(start, end))
+    return query, [('year', 1), ('month', 1), ('date', 1)]
+
+
+def backfill_daily_records(db):
+    """Populate daily_records from every stored attendance report."""
+    total = 0
+    for doc in db.attendance_reports.find({}, {'user_id': 1, 'year': 1, 'month': 1, 'daily_report': 1}):
+        total += len(replace_daily_records(
+            db, doc['user_id'], doc.get('year'), doc.get('month'), doc.get('daily_report') or []
+        ))
+    return total
@@ -1,12 +1,17 @@
 """
 MongoDB Database setup for the Attendance Processing System.
-Uses PyMongo to connect to MongoDB Atlas.
+Uses PyMongo to connect to MongoDB Atlas, or a local SQLite file when
+STORAGE_BACKEND=sqlite.
 """
 
 import os
+import re
 import certifi
-from pymongo import MongoClient, ASCENDING, DESCENDING
+from pymongo import MongoClient, ASCENDING, DESCENDING, UpdateOne
+from pymongo.errors import CollectionInvalid
 from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from db_monitoring import command_timer
 
 MONGO_URI = os.environ.get(
     'MONGODB_URI',
@@ -14,22 +19,74 @@ MONGO_URI = os.environ.get(
 )
 DB_NAME = os.environ.get('MONGODB_DB_NAME', 'biometric_attendance')
 
+# STORAGE_BACKEND=sqlite keeps everything in a local file (see sqlite_store.py)
+# instead of the remote MongoDB cluster.
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'mongodb').lower()
+SQLITE_PATH = os.environ.get(
+    'SQLITE_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'attendance_store.db')
+)
+
 _client = None
+_sqlite_db = None
 
 
 def get_client():
     global _client
     if _client is None:
-        _client = MongoClient(MONGO_URI, tlsCAFile=certifi.where())
+        _client = MongoClient(MONGO_URI, tlsCAFile=certifi.where(), event_listeners=[command_timer])
     return _client
 
 
 def get_db():
+    if STORAGE_BACKEND == 'sqlite':
+        global _sqlite_db
+        if _sqlite_db is None:
+            from sqlite_store import SqliteDatabase
+            _sqlite_db = SqliteDatabase(SQLITE_PATH)
+        return _sqlite_db
     return get_client()[DB_NAME]
 
 
-def init_db():
-    db = get_db()
+def ping_db():
+    """Round-trip to the database; raises if it is unreachable."""
+    if STORAGE_BACKEND == 'sqlite':
+        return get_db().command('ping')
+    return get_client().admin.command('ping')
+
+
+def normalize_employee_id(value):
+    """Return the canonical stored form of an employee ID.
+
+    Numeric IDs (35, "35", "35.0", 35.0) are always stored as int, matching the
+    INTEGER column in supabase_schema.sql. Non-numeric IDs, and numeric ones
+    beyond the 64-bit range, are kept as stripped strings so they still
+    round-trip.
+    """
+    if value is None or isinstance(value, bool):
+        return value
+    if isinstance(value, int):
+        return value
+    if isinstance(value, float):
+        return int(value) if value.is_integer() else value
+    text = str(value).strip()
+    # Plain digits convert exactly; going through float would corrupt IDs
+    # longer than 2**53.
+    if re.fullmatch(r'[+-]?\d+', text):
+        number = int(text)
+    else:
+        try:
+            decimal = Decimal(text)
+        except InvalidOperation:
+            return text
+        if not decimal.is_finite() or decimal != decimal.to_integral_value():
+            return text
+        number = int(decimal)
+    # BSON integers are 64-bit; larger IDs stay strings rather than fail to save.
+    return number if -2**63 <= number < 2**63 else text
+
+
+def init_db(db=None):
+    db = db if db is not None else get_db()
 
     db.users.create_index([('email', ASCENDING)], unique=True)
 
@@ -43,6 +100,107 @@ def init_db():
         unique=True,
     )
 
-    db.manual_users.create_index([('user_id', ASCENDING)])
-    db.finalized_salaries.create_index([('user_id', ASCENDING)])
-    db.confirmed_salaries.create_index([('user_id', ASCENDING)])
+    # Compound indexes match the (filter, sort) shape of the GET endpoints so
+    # results come back in index order; their user_id prefix also serves the
+    # plain per-user lookups and deletes.
+    db.attendance_reports.create_index(
+        [('user_id', ASCENDING), ('updated_at', DESCENDING)],
+    )
+
+    db.daily_records.create_index(
+        [('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING),
+         ('employee_id', ASCENDING), ('date', ASCENDING)],
+    )
+    db.daily_records.create_index(
+        [('user_id', ASCENDING), ('employee_id', ASCENDING), ('year', ASCENDING),
+         ('month', ASCENDING), ('date', ASCENDING)],
+    )
+    db.daily_records.create_index(
+        [('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING),
+         ('status', ASCENDING), ('date', ASCENDING)],
+    )
+    db.daily_records.create_index(
+        [('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING),
+         ('name_key', ASCENDING), ('date', ASCENDING)],
+    )
+    db.daily_records.create_index(
+        [('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING),
+         ('date', ASCENDING)],
+    )
+    db.daily_records.create_index(
+        [('user_id', ASCENDING), ('year', ASCENDING), ('month', ASCENDING),
+         ('worked_hours', ASCENDING), ('date', ASCENDING)],
+    )
+
+    db.manual_users.create_index(
+        [('user_id', ASCENDING), ('employee_id', ASCENDING)],
+    )
+    db.manual_users.create_index(
+        [('user_id', ASCENDING), ('created_at', ASCENDING)],
+    )
+
+    create_punch_events_collection(db)
+
+    db.finalized_salaries.create_index(
+        [('user_id', ASCENDING), ('finalized_at', DESCENDING)],
+    )
+    db.confirmed_salaries.create_index(
+        [('user_id', ASCENDING), ('confirmed_at', DESCENDING)],
+    )
+
+
+def create_punch_events_collection(db):
+    """Create the punch_events time-series collection and its index.
+
+    A time-series collection buckets events per (user, employee, device) so a
+    day's punches sit in a few buckets. It has to exist before the first
+    insert; otherwise MongoDB creates a plain collection in its place.
+    """
+    if 'punch_events' not in db.list_collection_names():
+        try:
+            db.create_collection('punch_events', timeseries={
+                'timeField': 'timestamp',
+                'metaField': 'meta',
+                'granularity': 'minutes',
+            })
+        except CollectionInvalid:
+            pass  # created concurrently by another worker
+    db.punch_events.create_index(
+        [('meta.user_id', ASCENDING), ('meta.employee_id', ASCENDING), ('timestamp', ASCENDING)],
+    )
+
+
+EMPLOYEE_ID_COLLECTIONS = ('manual_users', 'hour_rates', 'confirmed_salaries')
+
+
+def migrate_employee_ids():
+    """One-off migration: rewrite string employee_id values to their canonical form.
+
+    Returns a dict of {collection: documents_changed}. When the canonical value
+    already exists under a unique index (e.g. both "35" and 35 in hour_rates),
+    the legacy string document is dropped in favour of the canonical one.
+    """
+    db = get_db()
+    changed = {}
+
+    for name in EMPLOYEE_ID_COLLECTIONS:
+        coll = db[name]
+        ops = []
+        duplicates = []
+        for doc in coll.find({'employee_id': {'$type': 'string'}}, {'user_id': 1, 'employee_id': 1}):
+            canonical = normalize_employee_id(doc['employee_id'])
+            if canonical == doc['employee_id']:
+                continue
+            if name == 'hour_rates' and coll.count_documents(
+                {'user_id': doc.get('user_id'), 'employee_id': canonical}, limit=1
+            ):
+                duplicates.append(doc['_id'])
+                continue
+            ops.append(UpdateOne({'_id': doc['_id']}, {'$set': {'employee_id': canonical}}))
+
+        count = coll.bulk_write(ops, ordered=False).modified_count if ops else 0
+        if duplicates:
+            coll.delete_many({'_id': {'$in': duplicates}})
+        changed[name] = count + len(duplicates)
+
+    return changed
@@ -0,0 +1,137 @@
+"""
+MongoDB command timing, slow-query log and per-request DB time.
+
+CommandTimer is a pymongo CommandListener registered by database.get_client().
+Every command is timed into the db_command_duration_seconds histogram by
+collection and command name. Commands slower than DB_SLOW_QUERY_MS are logged
+with the shape of their filter (field names and operators, values replaced by
+"?"), so N+1 loops and missing indexes show up without leaking data. The
+SQLite backend (sqlite_store.py) reports its operations the same way.
+
+init_app() adds a Server-Timing header to each response with the time spent in
+the database and the number of commands the request issued:
+
+    Server-Timing: db;dur=12.4;desc="7 commands"
+
+    DB_SLOW_QUERY_MS   slow-command threshold in milliseconds (default 100;
+                       negative disables the log)
+"""
+
+import logging
+import os
+import threading
+
+from pymongo import monitoring
+
+from metrics import registry
+
+DB_SLOW_QUERY_MS = float(os.environ.get('DB_SLOW_QUERY_MS', '100'))
+
+logger = logging.getLogger('db.slow')
+
+DB_COMMAND_SECONDS = registry.histogram(
+    'db_command_duration_seconds', 'Database command latency', ('collection', 'command'))
+DB_COMMAND_FAILURES = registry.counter(
+    'db_command_failures_total', 'Database commands that returned an error', ('collection', 'command'))
+
+# Where each command keeps its filter, for the slow-query log.
+_FILTER_FIELDS = {
+    'find': 'filter', 'count': 'query', 'distinct': 'query', 'findAndModify': 'query',
+    'aggregate': 'pipeline', 'update': 'updates', 'delete': 'deletes',
+}
+
+_request = threading.local()
+
+
+def filter_shape(value):
+    """Structure of a filter with every value replaced by '?'."""
+    if isinstance(value, dict):
+        return {k: filter_shape(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [filter_shape(v) for v in value if isinstance(v, (dict, list, tuple))]
+        return shapes if shapes else '?'
+    return '?'
+
+
+def _command_filter(command_name, command):
+    field = _FILTER_FIELDS.get(command_name)
+    if field is None:
+        return None
+    value = command.get(field)
+    if command_name == 'aggregate':
+        return [{stage: filter_shape(arg) if stage == '$match' else '...'}
+                for stage_doc in value or [] for stage, arg in stage_doc.items()]
+    if command_name in ('update', 'delete'):
+        return [filter_shape(op.get('q')) for op in (value or [])[:3]]
+    return filter_shape(value)
+
+
+def is_slow(seconds):
+    return 0 <= DB_SLOW_QUERY_MS <= seconds * 1000
+
+
+def record_command(collection, command, seconds, failed=False, shape=None):
+    """Record one database command (also called by the SQLite backend)."""
+    DB_COMMAND_SECONDS.observe(seconds, collection=collection, command=command)
+    if failed:
+        DB_COMMAND_FAILURES.inc(collection=collection, command=command)
+
+    if getattr(_request, 'active', False):
+        _request.seconds += seconds
+        _request.commands += 1
+
+    if is_slow(seconds):
+        logger.warning(f"Slow {command} on {collection}: {seconds * 1000:.1f} ms filter={shape}")
+
+
+class CommandTimer(monitoring.CommandListener):
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(event):
+        return event.connection_id, event.request_id
+
+    def started(self, event):
+        command = event.command
+        target = command.get('collection') if event.command_name == 'getMore' else command.get(event.command_name)
+        collection = target if isinstance(target, str) else ''
+        with self._lock:
+            self._pending[self._key(event)] = (collection, command)
+
+    def _finish(self, event, failed):
+        with self._lock:
+            collection, command = self._pending.pop(self._key(event), ('', None))
+        seconds = event.duration_micros / 1e6
+        shape = _command_filter(event.command_name, command) if is_slow(seconds) and command else None
+        record_command(collection or event.database_name, event.command_name, seconds, failed, shape)
+
+    def succeeded(self, event):
+        self._finish(event, failed=False)
+
+    def failed(self, event):
+        self._finish(event, failed=True)
+
+
+command_timer = CommandTimer()
+
+
+def init_app(app):
+    """Attach per-request DB time and command count as a Server-Timing header."""
+
+    @app.before_request
+    def _start_db_timing():
+        _request.active = True
+        _request.seconds = 0.0
+        _request.commands = 0
+
+    @app.after_request
+    def _server_timing(response):
+        if getattr(_request, 'active', False):
+            _request.active = False
+            response.headers.add(
+                'Server-Timing',
+                f'db;dur={_request.seconds * 1000:.1f};desc="{_request.commands} commands"',
+            )
+        return response
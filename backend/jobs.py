@@ -0,0 +1,132 @@
+"""
+Background processing jobs with progress events.
+
+A job runs on a small thread pool and records every progress event it
+receives. Clients follow the events over Server-Sent Events. Submitting the
+same upload again (same user, same file bytes, same parameters) while a job is
+running or recently finished returns the existing job instead of starting a
+duplicate run.
+"""
+
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+PROCESS_WORKERS = int(os.environ.get('PROCESS_WORKERS', '2'))
+JOB_RETENTION_SECONDS = int(os.environ.get('JOB_RETENTION_SECONDS', '900'))
+SSE_HEARTBEAT_SECONDS = 15
+
+
+class Job:
+    def __init__(self, user_id, fingerprint):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.fingerprint = fingerprint
+        self.status = 'queued'
+        self.created_at = time.time()
+        self.finished_at = None
+        self.events = []
+        self.result = None
+        self.error = None
+        self._cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status in ('succeeded', 'failed')
+
+    def add_event(self, event):
+        with self._cond:
+            event = dict(event)
+            event['elapsed'] = round(time.time() - self.created_at, 3)
+            self.events.append(event)
+            self._cond.notify_all()
+
+    def finish(self, status, result=None, error=None):
+        with self._cond:
+            self.status = status
+            self.result = result
+            self.error = error
+            self.finished_at = time.time()
+            self.events.append({'stage': 'job', 'event': status, 'error': error,
+                                'elapsed': round(self.finished_at - self.created_at, 3)})
+            self._cond.notify_all()
+
+    def wait_for_events(self, start, timeout):
+        """Return events after index `start`, waiting up to `timeout` for new ones."""
+        with self._cond:
+            if len(self.events) <= start and not self.done:
+                self._cond.wait(timeout)
+            return self.events[start:]
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'status': self.status,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+            'events': len(self.events),
+            'error': self.error,
+        }
+
+
+class JobRegistry:
+    def __init__(self, workers=PROCESS_WORKERS):
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='process-job')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def _purge(self):
+        cutoff = time.time() - JOB_RETENTION_SECONDS
+        for job_id in [j.id for j in self._jobs.values() if j.done and j.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def get(self, job_id, user_id):
+        job = self._jobs.get(job_id)
+        return job if job is not None and job.user_id == user_id else None
+
+    def submit(self, user_id, fingerprint, fn):
+        """Run fn(job) in the background; returns (job, is_duplicate).
+
+        `fn` reports progress with job.add_event(...) and returns the result.
+        """
+        with self._lock:
+            self._purge()
+            for job in self._jobs.values():
+                if job.user_id == user_id and job.fingerprint == fingerprint and job.status != 'failed':
+                    return job, True
+            job = Job(user_id, fingerprint)
+            self._jobs[job.id] = job
+
+        def run():
+            job.status = 'running'
+            try:
+                job.finish('succeeded', result=fn(job))
+            except Exception as e:
+                job.finish('failed', error=str(e))
+
+        self._executor.submit(run)
+        return job, False
+
+
+def sse_stream(job, last_event_id=None):
+    """Yield a job's events as SSE messages until it finishes."""
+    index = int(last_event_id) + 1 if last_event_id and last_event_id.isdigit() else 0
+    while True:
+        events = job.wait_for_events(index, SSE_HEARTBEAT_SECONDS)
+        if not events:
+            if job.done:
+                return
+            yield ': keep-alive\n\n'
+            continue
+        for event in events:
+            name = 'done' if event.get('stage') == 'job' else 'progress'
+            yield f"id: {index}\nevent: {name}\ndata: {json.dumps(event, default=str)}\n\n"
+            index += 1
+        if job.done and index >= len(job.events):
+            return
+
+
+jobs = JobRegistry()
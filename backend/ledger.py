@@ -0,0 +1,186 @@
+"""
+Multi-month attendance ledger on local disk.
+
+Each processed month's daily report is appended to a Parquet dataset
+partitioned by year and month:
+
+    <root>/year=2025/month=12/part-0.parquet
+
+Range queries only open the partitions in range and only decode the columns
+asked for, so multi-year analytics never needs the original Excel exports.
+
+Usage:
+    ledger = AttendanceLedger("ledger")
+    daily, summary = processor.process(...)
+    ledger.append_month(daily, year=2025, month=12)
+
+    absences = ledger.query(start=(2025, 1), end=(2025, 12),
+                            statuses=["Absent"], columns=["employee_id", "date"])
+"""
+
+import shutil
+from datetime import date
+from pathlib import Path
+from typing import Iterable, List, Optional, Tuple
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+except ImportError:  # optional dependency
+    pa = ds = pq = None
+
+YearMonth = Tuple[int, int]
+
+LEDGER_SCHEMA_COLUMNS = [
+    'employee_id', 'employee_name', 'date', 'punch_count', 'punches',
+    'worked_hours', 'hours_hm', 'status',
+]
+
+
+class AttendanceLedger:
+    """Columnar, partitioned store of daily attendance across months."""
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: Directory holding the partitioned dataset (created if missing)
+        """
+        if pa is None:
+            raise ImportError("AttendanceLedger requires pyarrow (pip install pyarrow)")
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _partition_dir(self, year: int, month: int) -> Path:
+        return self.root / f"year={year}" / f"month={month}"
+
+    def append_month(self, df_daily: pd.DataFrame, year: int, month: int) -> Path:
+        """
+        Store one month's daily report, replacing that month if already present.
+
+        Args:
+            df_daily: Daily report as returned by AttendanceProcessor.process
+            year: Year of the report
+            month: Month of the report
+
+        Returns:
+            Path of the written Parquet file
+        """
+        columns = [c for c in LEDGER_SCHEMA_COLUMNS if c in df_daily.columns]
+        frame = df_daily[columns].copy()
+        frame['date'] = pd.to_datetime(frame['date']).dt.date
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+
+        # Write into "_staging" (ignored by dataset discovery) and swap the
+        # directory in, so readers never see a half-written partition.
+        target = self._partition_dir(year, month)
+        staging = self.root / "_staging" / f"{year}-{month}"
+        if staging.exists():
+            shutil.rmtree(staging)
+        staging.mkdir(parents=True)
+        pq.write_table(table, staging / "part-0.parquet", compression="zstd")
+
+        if target.exists():
+            shutil.rmtree(target)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        staging.rename(target)
+        return target / "part-0.parquet"
+
+    def months(self) -> List[YearMonth]:
+        """All (year, month) partitions currently stored, in order."""
+        found = []
+        for year_dir in self.root.glob("year=*"):
+            for month_dir in year_dir.glob("month=*"):
+                found.append((int(year_dir.name[5:]), int(month_dir.name[6:])))
+        return sorted(found)
+
+    def _dataset(self):
+        return ds.dataset(str(self.root), format="parquet", partitioning="hive")
+
+    @staticmethod
+    def _month_filter(start: Optional[YearMonth], end: Optional[YearMonth]):
+        # Plain comparisons on the partition fields, so the dataset can prune
+        # whole directories before opening any file.
+        year, month = ds.field('year'), ds.field('month')
+        expr = None
+        if start is not None:
+            expr = (year > start[0]) | ((year == start[0]) & (month >= start[1]))
+        if end is not None:
+            upper = (year < end[0]) | ((year == end[0]) & (month <= end[1]))
+            expr = upper if expr is None else expr & upper
+        return expr
+
+    def query(self,
+              start: Optional[YearMonth] = None,
+              end: Optional[YearMonth] = None,
+              employee_ids: Optional[Iterable[int]] = None,
+              statuses: Optional[Iterable[str]] = None,
+              date_from: Optional[date] = None,
+              date_to: Optional[date] = None,
+              columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        Read daily rows matching the filters.
+
+        Partition pruning happens on (year, month); employee, status and date
+        filters are pushed down to the Parquet row-group statistics.
+
+        Args:
+            start, end: Inclusive (year, month) bounds
+            employee_ids: Only these employees
+            statuses: Only these statuses (e.g. ["Absent"])
+            date_from, date_to: Inclusive date bounds
+            columns: Columns to read (default: all); 'year' and 'month' allowed
+
+        Returns:
+            DataFrame of matching rows
+        """
+        if not self.months():
+            return pd.DataFrame(columns=columns or LEDGER_SCHEMA_COLUMNS)
+
+        if date_from is not None and start is None:
+            start = (date_from.year, date_from.month)
+        if date_to is not None and end is None:
+            end = (date_to.year, date_to.month)
+
+        expr = self._month_filter(start, end)
+        conditions = []
+        if employee_ids is not None:
+            conditions.append(ds.field('employee_id').isin(list(employee_ids)))
+        if statuses is not None:
+            conditions.append(ds.field('status').isin(list(statuses)))
+        if date_from is not None:
+            conditions.append(ds.field('date') >= pa.scalar(date_from, pa.date32()))
+        if date_to is not None:
+            conditions.append(ds.field('date') <= pa.scalar(date_to, pa.date32()))
+        for condition in conditions:
+            expr = condition if expr is None else expr & condition
+
+        table = self._dataset().to_table(columns=columns, filter=expr)
+        return table.to_pandas()
+
+    def employee_totals(self, start: Optional[YearMonth] = None,
+                        end: Optional[YearMonth] = None) -> pd.DataFrame:
+        """
+        Per-employee totals over a month range, reading only the needed columns.
+
+        Returns:
+            DataFrame with employee_id, employee_name, total_hours, present_days,
+            absent_days and months
+        """
+        df = self.query(start=start, end=end,
+                        columns=['employee_id', 'employee_name', 'worked_hours', 'status', 'year', 'month'])
+        if df.empty:
+            return pd.DataFrame(columns=['employee_id', 'employee_name', 'total_hours',
+                                         'present_days', 'absent_days', 'months'])
+        df['present'] = df['status'] == 'Present'
+        df['absent'] = df['status'] == 'Absent'
+        df['period'] = df['year'].astype(int) * 100 + df['month'].astype(int)
+        return df.groupby('employee_id').agg(
+            employee_name=('employee_name', 'last'),
+            total_hours=('worked_hours', 'sum'),
+            present_days=('present', 'sum'),
+            absent_days=('absent', 'sum'),
+            months=('period', 'nunique'),
+        ).reset_index()
@@ -0,0 +1,457 @@
+"""
+Load Test - Attendance Processing System
+Starts api.py against a throwaway local database, mints JWTs with
+auth.create_token for a set of simulated accounts and drives a weighted mix of
+requests from concurrent workers for a fixed time:
+
+    process   POST /api/process with a synthetic device export
+              (create_sample.create_device_export), then saves the result with
+              POST /api/data/attendance-reports, as the UI does
+    reports   report reads: attendance-reports, daily-records,
+              last-process-result, employees/<id>/calendar, confirmed-salaries
+    salaries  bulk saves: confirmed-salaries and finalized-salaries for every
+              employee of the account
+
+Throughput, latency percentiles, error rates and the DB time reported in the
+Server-Timing header are printed per route. Every account is seeded with one
+processed month before the clock starts, so reads hit real data.
+
+The server uses the embedded SQLite backend in a temporary directory by
+default; pass --mongodb-uri to use a local mongod instead (never production).
+
+Usage:
+    python loadtest.py --concurrency 16 --duration 60
+    python loadtest.py --mix process=1,reports=8,salaries=2 --json baseline.json
+    JWT_SECRET_KEY=... python loadtest.py --url http://localhost:5000
+"""
+
+import argparse
+import gzip
+import io
+import json
+import os
+import random
+import secrets
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+import uuid
+from datetime import datetime
+
+from create_sample import create_device_export
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_MIX = 'process=1,reports=8,salaries=2'
+PERCENTILES = (50, 90, 95, 99)
+
+
+# ---------------------------------------------------------------------------
+# Results
+
+class RouteStats:
+    def __init__(self):
+        self.latencies = []
+        self.db_ms = []
+        self.errors = 0
+        self.statuses = {}
+
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.routes = {}
+
+    def record(self, route, seconds, status, db_ms=None):
+        with self.lock:
+            stats = self.routes.setdefault(route, RouteStats())
+            stats.latencies.append(seconds)
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            if status == 0 or status >= 400:
+                stats.errors += 1
+            if db_ms is not None:
+                stats.db_ms.append(db_ms)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, -(-len(sorted_values) * pct // 100))
+    return sorted_values[int(rank) - 1]
+
+
+def summarize(results, elapsed):
+    rows = {}
+    for route, stats in sorted(results.routes.items()):
+        latencies = sorted(stats.latencies)
+        count = len(latencies)
+        rows[route] = {
+            'requests': count,
+            'throughput_rps': count / elapsed if elapsed else 0.0,
+            'error_rate': stats.errors / count if count else 0.0,
+            'statuses': {str(k): v for k, v in sorted(stats.statuses.items())},
+            'latency_ms': dict(
+                {f'p{p}': percentile(latencies, p) * 1000 for p in PERCENTILES},
+                mean=sum(latencies) / count * 1000 if count else 0.0,
+                max=latencies[-1] * 1000 if latencies else 0.0,
+            ),
+            'db_ms_mean': sum(stats.db_ms) / len(stats.db_ms) if stats.db_ms else None,
+        }
+    return rows
+
+
+def print_report(rows, elapsed):
+    header = (f"{'route':44} {'reqs':>6} {'req/s':>7} {'err%':>6} {'p50':>8} {'p90':>8} "
+              f"{'p95':>8} {'p99':>8} {'max':>8} {'db':>7}")
+    print(header)
+    print('-' * len(header))
+    total = errors = 0
+    for route, row in rows.items():
+        ms = row['latency_ms']
+        db = f"{row['db_ms_mean']:.1f}" if row['db_ms_mean'] is not None else '-'
+        print(f"{route:44} {row['requests']:6} {row['throughput_rps']:7.1f} {row['error_rate'] * 100:6.1f} "
+              f"{ms['p50']:8.1f} {ms['p90']:8.1f} {ms['p95']:8.1f} {ms['p99']:8.1f} {ms['max']:8.1f} {db:>7}")
+        total += row['requests']
+        errors += round(row['error_rate'] * row['requests'])
+    print('-' * len(header))
+    print(f"{'total':44} {total:6} {total / elapsed if elapsed else 0:7.1f} "
+          f"{errors / total * 100 if total else 0:6.1f}")
+    print("Latencies and db (mean Server-Timing db time) in ms.")
+    for route, row in rows.items():
+        failed = {s: n for s, n in row['statuses'].items() if s == '0' or int(s) >= 400}
+        if failed:
+            print(f"  {route}: status counts {failed} (0 = connection error)")
+
+
+# ---------------------------------------------------------------------------
+# HTTP client
+
+class Client:
+    """Minimal JSON/multipart client that records every call in Results."""
+
+    def __init__(self, base_url, token, results, timeout):
+        self.base_url = base_url.rstrip('/')
+        self.token = token
+        self.results = results
+        self.timeout = timeout
+
+    def request(self, route, method, path, body=None, content_type=None):
+        headers = {'Authorization': f'Bearer {self.token}', 'Accept-Encoding': 'gzip'}
+        if content_type:
+            headers['Content-Type'] = content_type
+        req = urllib.request.Request(self.base_url + path, data=body, headers=headers, method=method)
+
+        start = time.perf_counter()
+        status, payload, server_timing = 0, None, None
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as response:
+                status, payload = response.status, response.read()
+                encoding, server_timing = response.headers.get('Content-Encoding'), response.headers.get('Server-Timing')
+        except urllib.error.HTTPError as e:
+            status, payload = e.code, e.read()
+            encoding, server_timing = e.headers.get('Content-Encoding'), e.headers.get('Server-Timing')
+        except OSError:
+            encoding = None
+        self.results.record(route, time.perf_counter() - start, status, _db_ms(server_timing))
+
+        if encoding == 'gzip' and payload:
+            payload = gzip.decompress(payload)
+        if status != 200 or not payload:
+            return None
+        return json.loads(payload)
+
+    def get(self, route, path):
+        return self.request(route, 'GET', path)
+
+    def post_json(self, route, path, data):
+        return self.request(route, 'POST', path, json.dumps(data).encode(), 'application/json')
+
+    def post_file(self, route, path, fields, filename, file_bytes):
+        boundary = uuid.uuid4().hex
+        parts = [f'--{boundary}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode()
+                 for name, value in fields.items()]
+        parts.append(f'--{boundary}\r\nContent-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                     f'Content-Type: application/vnd.openxmlformats-officedocument.spreadsheetml.sheet\r\n\r\n'
+                     .encode() + file_bytes + b'\r\n')
+        parts.append(f'--{boundary}--\r\n'.encode())
+        return self.request(route, 'POST', path, b''.join(parts), f'multipart/form-data; boundary={boundary}')
+
+
+def _db_ms(server_timing):
+    for metric in (server_timing or '').split(','):
+        name, _, params = metric.strip().partition(';')
+        if name == 'db':
+            for param in params.split(';'):
+                key, _, value = param.strip().partition('=')
+                if key == 'dur':
+                    return float(value)
+    return None
+
+
+# ---------------------------------------------------------------------------
+# Scenarios
+
+class Account:
+    def __init__(self, index, token, upload, employees):
+        self.index = index
+        self.token = token
+        self.upload = upload
+        self.employees = employees
+
+
+def scenario_process(client, account, args):
+    result = client.post_file('POST /api/process', '/api/process',
+                              {'year': args.year, 'month': args.month, 'max_hours': 8},
+                              f'attendance_{account.index}.xlsx', account.upload)
+    if result is None:
+        return
+    client.post_json('POST /api/data/attendance-reports', '/api/data/attendance-reports', {
+        'year': args.year,
+        'month': args.month,
+        'daily_report': result['daily_report'],
+        'monthly_summary': result['monthly_summary'],
+        'statistics': result['statistics'],
+        'output_file': result.get('output_file'),
+    })
+
+
+def scenario_reports(client, account, args):
+    period = f'year={args.year}&month={args.month}'
+    employee_id = random.randint(1, account.employees)
+    client.get('GET /api/data/attendance-reports', f'/api/data/attendance-reports?{period}')
+    client.get('GET /api/data/daily-records', f'/api/data/daily-records?{period}&limit=100&sort=date')
+    client.get('GET /api/data/last-process-result', '/api/data/last-process-result')
+    client.get('GET /api/employees/<id>/calendar', f'/api/employees/{employee_id}/calendar?{period}')
+    client.get('GET /api/data/confirmed-salaries', '/api/data/confirmed-salaries')
+
+
+def scenario_salaries(client, account, args):
+    now = datetime.utcnow().isoformat()
+    salaries = []
+    for employee_id in range(1, account.employees + 1):
+        hours = round(random.uniform(80, 200), 2)
+        rate = random.choice([100, 150, 200, 250])
+        salaries.append({
+            'employee_id': employee_id,
+            'employee_name': f'Employee {employee_id}',
+            'total_hours': hours,
+            'hour_rate': rate,
+            'salary': round(hours * rate, 2),
+            'confirmed_at': now,
+        })
+    client.post_json('POST /api/data/confirmed-salaries', '/api/data/confirmed-salaries', salaries)
+    client.post_json('POST /api/data/finalized-salaries', '/api/data/finalized-salaries', {
+        f'{args.year}-{args.month:02d}': {
+            'year': args.year,
+            'month': args.month,
+            'employees': salaries,
+            'total_salary': round(sum(s['salary'] for s in salaries), 2),
+            'finalized_at': now,
+        },
+    })
+
+
+SCENARIOS = {
+    'process': scenario_process,
+    'reports': scenario_reports,
+    'salaries': scenario_salaries,
+}
+
+
+def parse_mix(text):
+    """'process=1,reports=8' -> {'process': 1.0, 'reports': 8.0}"""
+    mix = {}
+    for item in text.split(','):
+        name, _, weight = item.partition('=')
+        name = name.strip()
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"unknown scenario '{name}' (choose from {', '.join(SCENARIOS)})")
+        try:
+            mix[name] = float(weight or 1)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"invalid weight for '{name}': {weight}")
+    if not any(w > 0 for w in mix.values()):
+        raise argparse.ArgumentTypeError('at least one scenario needs a positive weight')
+    return mix
+
+
+# ---------------------------------------------------------------------------
+# Server
+
+def start_server(args, workdir, db_name):
+    """Run api.py on a local port against a throwaway database; returns (process, url, log path)."""
+    env = dict(os.environ, PORT=str(args.port), JWT_SECRET_KEY=os.environ['JWT_SECRET_KEY'],
+               DB_SLOW_QUERY_MS='-1')
+    env.pop('FLASK_ENV', None)
+    if args.mongodb_uri:
+        env.update(STORAGE_BACKEND='mongodb', MONGODB_URI=args.mongodb_uri, MONGODB_DB_NAME=db_name)
+    else:
+        env.update(STORAGE_BACKEND='sqlite', SQLITE_PATH=os.path.join(workdir, 'loadtest.db'))
+
+    log_path = os.path.join(workdir, 'server.log')
+    with open(log_path, 'w') as log:
+        process = subprocess.Popen([sys.executable, 'api.py'], cwd=BACKEND_DIR, env=env,
+                                   stdout=log, stderr=subprocess.STDOUT)
+
+    url = f'http://127.0.0.1:{args.port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'api.py exited with code {process.returncode}; see {log_path}')
+        try:
+            with urllib.request.urlopen(f'{url}/api/health', timeout=2):
+                return process, url, log_path
+        except OSError:
+            time.sleep(0.25)
+    process.terminate()
+    raise RuntimeError(f'api.py did not become healthy within 60s; see {log_path}')
+
+
+def stop_server(process, mongodb_uri, db_name):
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+    if mongodb_uri and db_name:
+        from pymongo import MongoClient
+        MongoClient(mongodb_uri).drop_database(db_name)
+
+
+# ---------------------------------------------------------------------------
+# Runner
+
+def make_accounts(args):
+    from auth import create_token
+
+    accounts = []
+    for index in range(args.accounts):
+        user_id = secrets.token_hex(12)  # ObjectId-shaped
+        token = create_token(user_id, f'loadtest{index}@example.com', 'admin')
+        upload = io.BytesIO()
+        create_device_export(upload, employees=args.employees, year=args.year, month=args.month,
+                             seed=args.seed + index)
+        accounts.append(Account(index, token, upload.getvalue(), args.employees))
+    return accounts
+
+
+def run_load(url, accounts, args):
+    names, weights = zip(*args.mix.items())
+    results = Results()
+    deadline = time.monotonic() + args.duration
+
+    def worker(seed):
+        rng = random.Random(seed)
+        clients = {}
+        while time.monotonic() < deadline:
+            account = rng.choice(accounts)
+            client = clients.get(account.index)
+            if client is None:
+                client = clients[account.index] = Client(url, account.token, results, args.timeout)
+            SCENARIOS[rng.choices(names, weights)[0]](client, account, args)
+
+    threads = [threading.Thread(target=worker, args=(args.seed * 1000 + i,), daemon=True)
+               for i in range(args.concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, time.perf_counter() - start
+
+
+def seed_accounts(url, accounts, args):
+    """One processed and saved month per account; not counted in the results."""
+    for account in accounts:
+        results = Results()
+        scenario_process(Client(url, account.token, results, args.timeout), account, args)
+        failed = [r for r, s in results.routes.items() if s.errors]
+        if failed:
+            raise RuntimeError(f'seeding account {account.index} failed on {", ".join(failed)}')
+
+
+def parse_args(argv=None):
+    now = datetime.now()
+    parser = argparse.ArgumentParser(description='Load test the attendance API')
+    parser.add_argument('--url', help='Test an already running server instead of starting api.py '
+                                      '(tokens are signed with $JWT_SECRET_KEY)')
+    parser.add_argument('--port', type=int, default=5077, help='Port for the started server (default 5077)')
+    parser.add_argument('--mongodb-uri', help='Run the started server against this local mongod '
+                                              'instead of SQLite; a scratch database is created and dropped')
+    parser.add_argument('--concurrency', type=int, default=8, help='Concurrent workers (default 8)')
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run (default 30)')
+    parser.add_argument('--accounts', type=int, default=4, help='Simulated accounts (default 4)')
+    parser.add_argument('--employees', type=int, default=50, help='Employees per upload (default 50)')
+    parser.add_argument('--mix', type=parse_mix, default=parse_mix(DEFAULT_MIX),
+                        help=f'Scenario weights (default {DEFAULT_MIX})')
+    parser.add_argument('--year', type=int, default=now.year)
+    parser.add_argument('--month', type=int, default=now.month)
+    parser.add_argument('--timeout', type=float, default=120, help='Per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=1, help='Random seed for uploads and request order')
+    parser.add_argument('--json', metavar='PATH', help='Also write the results as JSON (for baselines)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    random.seed(args.seed)
+    workdir = tempfile.mkdtemp(prefix='attendance_loadtest_')
+    if not args.url:
+        os.environ['JWT_SECRET_KEY'] = secrets.token_hex(32)
+    # The harness only needs auth.create_token; never touch a real database from here.
+    os.environ.setdefault('STORAGE_BACKEND', 'sqlite')
+    os.environ.setdefault('SQLITE_PATH', os.path.join(workdir, 'harness.db'))
+
+    process, keep_workdir = None, False
+    db_name = f'attendance_loadtest_{secrets.token_hex(4)}'
+    try:
+        if args.url:
+            url = args.url
+        else:
+            process, url, log_path = start_server(args, workdir, db_name)
+            print(f"✓ api.py running at {url} (log: {log_path})")
+
+        accounts = make_accounts(args)
+        seed_accounts(url, accounts, args)
+        print(f"✓ Seeded {len(accounts)} account(s) with {args.employees} employees for "
+              f"{args.year}-{args.month:02d}")
+        print(f"Running {args.concurrency} worker(s) for {args.duration:g}s, mix "
+              + ', '.join(f'{k}={v:g}' for k, v in args.mix.items()))
+
+        results, elapsed = run_load(url, accounts, args)
+        rows = summarize(results, elapsed)
+        print()
+        print_report(rows, elapsed)
+
+        if args.json:
+            with open(args.json, 'w') as f:
+                json.dump({
+                    'started_server': process is not None,
+                    'storage': 'mongodb' if args.mongodb_uri else 'sqlite',
+                    'concurrency': args.concurrency,
+                    'duration_seconds': elapsed,
+                    'accounts': args.accounts,
+                    'employees': args.employees,
+                    'mix': args.mix,
+                    'routes': rows,
+                }, f, indent=2)
+            print(f"✓ Results written to {args.json}")
+        return 1 if any(row['error_rate'] for row in rows.values()) else 0
+    except RuntimeError as e:
+        print(f"✗ {e}")
+        keep_workdir = True
+        return 2
+    finally:
+        if process is not None:
+            stop_server(process, args.mongodb_uri, db_name)
+        if not keep_workdir:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,55 @@
+"""
+Maintenance commands for the Attendance Processing System database.
+
+Usage:
+    python manage.py init-db
+    python manage.py migrate-employee-ids
+    python manage.py backfill-daily-records
+"""
+
+import argparse
+import sys
+
+from database import get_db, init_db, migrate_employee_ids
+from daily_records import backfill_daily_records
+
+
+def cmd_init_db(args):
+    init_db()
+    print("✓ Indexes created/verified")
+    return 0
+
+
+def cmd_migrate_employee_ids(args):
+    changed = migrate_employee_ids()
+    for collection, count in changed.items():
+        print(f"✓ {collection:20} {count} document(s) normalized")
+    return 0
+
+
+def cmd_backfill_daily_records(args):
+    count = backfill_daily_records(get_db())
+    print(f"✓ {count} daily record(s) written")
+    return 0
+
+
+COMMANDS = {
+    'init-db': (cmd_init_db, 'Create or verify all collection indexes'),
+    'migrate-employee-ids': (cmd_migrate_employee_ids, 'Rewrite string employee_id values as integers'),
+    'backfill-daily-records': (cmd_backfill_daily_records, 'Copy stored report rows into daily_records'),
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Attendance database maintenance')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    for name, (_, help_text) in COMMANDS.items():
+        subparsers.add_parser(name, help=help_text)
+
+    args = parser.parse_args(argv)
+    handler, _ = COMMANDS[args.command]
+    return handler(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
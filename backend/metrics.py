@@ -0,0 +1,312 @@
+"""
+Prometheus-compatible metrics for the API, served at /api/metrics.
+
+Counters, gauges and histograms live in a thread-safe in-process registry.
+With several worker processes (gunicorn -w N), set METRICS_DIR to a directory
+shared by the workers: each one writes a snapshot of its registry there every
+METRICS_FLUSH_SECONDS, and a scrape merges the snapshots of all workers. Gauges
+of workers that have exited are dropped; their counters and histograms are
+kept so totals never go backwards.
+
+    METRICS_DIR             shared snapshot directory (unset: this process only)
+    METRICS_FLUSH_SECONDS   how often a worker rewrites its snapshot (default 5)
+    METRICS_TOKEN           if set, scrapes must send "Authorization: Bearer <token>"
+"""
+
+import atexit
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+METRICS_FLUSH_SECONDS = float(os.environ.get('METRICS_FLUSH_SECONDS', '5'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+SIZE_BUCKETS = (1024, 4096, 16384, 65536, 262144, 1048576, 4194304, 16777216, 67108864)
+ROW_BUCKETS = (10, 50, 100, 500, 1000, 5000, 10000, 50000, 100000, 500000)
+
+
+class Metric:
+    def __init__(self, registry, name, help, labelnames=(), buckets=None):
+        self.registry = registry
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) if buckets else None
+        self._values = {}
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+
+class Counter(Metric):
+    type = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = 'gauge'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set(self, value, **labels):
+        key = self._key(labels)
+        with self.registry.lock:
+            self._values[key] = value
+
+
+class Histogram(Metric):
+    """Per-bucket (non-cumulative) counts plus sum and count per label set."""
+
+    type = 'histogram'
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0, 0]
+            state[index] += 1
+            state[-2] += value
+            state[-1] += 1
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self._metrics = {}
+        self._last_flush = 0.0
+
+    def _register(self, cls, name, help, labelnames=(), buckets=None):
+        metric = cls(self, name, help, labelnames, buckets)
+        self._metrics[name] = metric
+        return metric
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Counter, name, help, labelnames)
+
+    def gauge(self, name, help, labelnames=()):
+        return self._register(Gauge, name, help, labelnames)
+
+    def histogram(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram, name, help, labelnames, buckets)
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                name: {
+                    'type': m.type,
+                    'help': m.help,
+                    'labelnames': list(m.labelnames),
+                    'buckets': list(m.buckets) if m.buckets else None,
+                    'samples': [[list(k), list(v) if isinstance(v, list) else v] for k, v in m._values.items()],
+                }
+                for name, m in self._metrics.items()
+            }
+
+    # Multi-process support
+
+    def _snapshot_path(self, pid):
+        return os.path.join(METRICS_DIR, f"metrics-{pid}.json")
+
+    def flush(self):
+        """Write this process's snapshot to METRICS_DIR (atomic replace)."""
+        if not METRICS_DIR:
+            return
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = self._snapshot_path(os.getpid())
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.snapshot(), f)
+        os.replace(tmp_path, path)
+        self._last_flush = time.monotonic()
+
+    def maybe_flush(self):
+        if METRICS_DIR and time.monotonic() - self._last_flush >= METRICS_FLUSH_SECONDS:
+            self.flush()
+
+    def collect(self):
+        """Snapshot merged across every worker that has written one."""
+        if not METRICS_DIR:
+            return self.snapshot()
+        self.flush()
+        merged = {}
+        for filename in os.listdir(METRICS_DIR):
+            if not (filename.startswith('metrics-') and filename.endswith('.json')):
+                continue
+            pid = int(filename[8:-5])
+            try:
+                with open(os.path.join(METRICS_DIR, filename)) as f:
+                    snapshot = json.load(f)
+            except (OSError, ValueError):
+                continue
+            _merge(merged, snapshot, alive=_pid_alive(pid))
+        return merged
+
+    def render(self):
+        return render_text(self.collect())
+
+
+def _pid_alive(pid):
+    if pid == os.getpid():
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _merge(merged, snapshot, alive):
+    for name, metric in snapshot.items():
+        if metric['type'] == 'gauge' and not alive:
+            continue
+        target = merged.setdefault(name, dict(metric, samples=[]))
+        index = {tuple(labels): i for i, (labels, _) in enumerate(target['samples'])}
+        for labels, value in metric['samples']:
+            i = index.get(tuple(labels))
+            if i is None:
+                index[tuple(labels)] = len(target['samples'])
+                target['samples'].append([labels, list(value) if isinstance(value, list) else value])
+            elif isinstance(value, list):
+                existing = target['samples'][i][1]
+                target['samples'][i][1] = [a + b for a, b in zip(existing, value)]
+            else:
+                target['samples'][i][1] += value
+
+
+# Text exposition
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values, extra=None):
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _number(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render_text(snapshot):
+    lines = []
+    for name, metric in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {metric['help']}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        names = metric['labelnames']
+        for labels, value in metric['samples']:
+            if metric['type'] != 'histogram':
+                lines.append(f"{name}{_labels(names, labels)} {_number(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(list(metric['buckets']) + [float('inf')], value[:-2]):
+                cumulative += count
+                lines.append(f"{name}_bucket{_labels(names, labels, ('le', _number(bound)))} {cumulative}")
+            lines.append(f"{name}_sum{_labels(names, labels)} {_number(value[-2])}")
+            lines.append(f"{name}_count{_labels(names, labels)} {value[-1]}")
+    lines.extend(_cache_hit_ratio_lines(snapshot.get('cache_requests_total')))
+    return '\n'.join(lines) + '\n'
+
+
+def _cache_hit_ratio_lines(metric):
+    if not metric:
+        return []
+    totals = {}
+    for (cache_name, result), value in ((tuple(labels), value) for labels, value in metric['samples']):
+        hits, total = totals.get(cache_name, (0, 0))
+        totals[cache_name] = (hits + (value if result == 'hit' else 0), total + value)
+    lines = ['# HELP cache_hit_ratio Share of cache lookups served from the cache',
+             '# TYPE cache_hit_ratio gauge']
+    for cache_name, (hits, total) in sorted(totals.items()):
+        lines.append(f'cache_hit_ratio{{cache="{_escape(cache_name)}"}} {_number(hits / total if total else 0.0)}')
+    return lines
+
+
+registry = Registry()
+
+REQUESTS = registry.counter(
+    'http_requests_total', 'HTTP requests handled', ('method', 'route', 'status'))
+REQUEST_SECONDS = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests', ('method', 'route'))
+IN_FLIGHT = registry.gauge(
+    'http_requests_in_flight', 'HTTP requests currently being handled')
+UPLOAD_BYTES = registry.histogram(
+    'upload_size_bytes', 'Size of multipart upload request bodies', ('route',), buckets=SIZE_BUCKETS)
+STAGE_SECONDS = registry.histogram(
+    'processor_stage_duration_seconds', 'AttendanceProcessor pipeline stage durations', ('stage',))
+PROCESSED_ROWS = registry.histogram(
+    'processor_rows', 'Rows produced per processing run', ('report',), buckets=ROW_BUCKETS)
+CACHE_REQUESTS = registry.counter(
+    'cache_requests_total', 'Cache lookups by result', ('cache', 'result'))
+
+
+def observe_processing(processor, daily_report, monthly_summary):
+    """Record stage timings and output sizes of one AttendanceProcessor run."""
+    for stage, seconds in processor.stage_timings.items():
+        STAGE_SECONDS.observe(seconds, stage=stage)
+    PROCESSED_ROWS.observe(len(daily_report), report='daily')
+    PROCESSED_ROWS.observe(len(monthly_summary), report='summary')
+
+
+def init_app(app):
+    """Time every request and expose GET /api/metrics on a Flask app."""
+    from flask import Response, g, jsonify, request
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_start = time.perf_counter()
+        IN_FLIGHT.inc()
+
+    @app.after_request
+    def _record_status(response):
+        g._metrics_status = response.status_code
+        return response
+
+    @app.teardown_request
+    def _observe_request(exc):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return
+        IN_FLIGHT.dec()
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        REQUEST_SECONDS.observe(time.perf_counter() - start, method=request.method, route=route)
+        REQUESTS.inc(method=request.method, route=route,
+                     status=500 if exc is not None else g.pop('_metrics_status', 500))
+        if request.mimetype == 'multipart/form-data' and request.content_length:
+            UPLOAD_BYTES.observe(request.content_length, route=route)
+        registry.maybe_flush()
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics_endpoint():
+        if METRICS_TOKEN and request.headers.get('Authorization', '') != f'Bearer {METRICS_TOKEN}':
+            return jsonify({'error': 'Invalid metrics token'}), 401
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    if METRICS_DIR:
+        atexit.register(registry.flush)
@@ -0,0 +1,72 @@
+"""
+Vectorized payroll computation.
+
+Joins a stored monthly summary with the user's hour rates in one pandas pass.
+Money is computed in integer paise and time in integer minutes, so the result
+is exact and independent of float rounding:
+
+    salary_paise = round_half_up(worked_minutes * rate_paise / 60)
+
+Worked minutes come from `total_hours_hm` (HH:MM) like the Reports page does,
+falling back to `total_hours` when the HH:MM value is missing.
+"""
+
+import numpy as np
+import pandas as pd
+
+from database import normalize_employee_id
+
+
+def _minutes_from_summary(df):
+    hm = df['total_hours_hm'] if 'total_hours_hm' in df else pd.Series('', index=df.index)
+    parts = hm.fillna('').astype(str).str.strip().str.extract(r'^(\d+):([0-5]\d)$')
+    from_hm = pd.to_numeric(parts[0], errors='coerce') * 60 + pd.to_numeric(parts[1], errors='coerce')
+
+    decimal = pd.to_numeric(df['total_hours'], errors='coerce') if 'total_hours' in df else pd.Series(np.nan, index=df.index)
+    from_decimal = np.floor(decimal.fillna(0).to_numpy(dtype=float) * 60)
+
+    return np.where(from_hm.notna(), from_hm.fillna(0), from_decimal).astype(np.int64)
+
+
+def compute_payroll(monthly_summary, hour_rates):
+    """Compute salaries for every employee in `monthly_summary`.
+
+    Args:
+        monthly_summary: list of summary dicts (or a DataFrame) with employee_id,
+            employee_name, total_hours_hm and/or total_hours
+        hour_rates: {employee_id: rate} as stored in hour_rates
+
+    Returns:
+        DataFrame with employee_id, employee_name, worked_minutes, total_hours
+        (decimal hours, as in monthly_summary), total_hours_hm (HH:MM),
+        hour_rate, rate_paise, salary_paise and salary.
+    """
+    df = pd.DataFrame(monthly_summary)
+    columns = ['employee_id', 'employee_name', 'worked_minutes', 'total_hours', 'total_hours_hm',
+               'hour_rate', 'rate_paise', 'salary_paise', 'salary']
+    if df.empty:
+        return pd.DataFrame(columns=columns)
+
+    df['employee_id'] = df['employee_id'].map(normalize_employee_id)
+    rates = pd.Series(
+        {normalize_employee_id(k): float(v) for k, v in (hour_rates or {}).items()},
+        dtype=float,
+    )
+
+    minutes = _minutes_from_summary(df)
+    rate = df['employee_id'].map(rates).fillna(0.0).to_numpy(dtype=float)
+    rate_paise = np.rint(rate * 100).astype(np.int64)
+    salary_paise = (minutes * rate_paise + 30) // 60
+
+    return pd.DataFrame({
+        'employee_id': df['employee_id'],
+        'employee_name': df.get('employee_name', pd.Series('', index=df.index)),
+        'worked_minutes': minutes,
+        'total_hours': minutes / 60,
+        'total_hours_hm': (pd.Series(minutes // 60, index=df.index).astype(str).str.zfill(2) + ':'
+                        + pd.Series(minutes % 60, index=df.index).astype(str).str.zfill(2)),
+        'hour_rate': rate,
+        'rate_paise': rate_paise,
+        'salary_paise': salary_paise,
+        'salary': salary_paise / 100,
+    }, columns=columns)
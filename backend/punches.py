@@ -0,0 +1,164 @@
+"""
+Raw punch events sent straight from biometric devices.
+
+Events are (employee_id, timestamp, device_id) triples stored in the
+punch_events time-series collection (see database.init_db). Daily hours are
+evaluated from them with the same rules AttendanceProcessor applies to Excel
+exports, so reports can be produced for any date range without waiting for a
+month file.
+
+Timestamps are kept as local wall-clock time, like the times in the exports.
+Timestamps with a UTC offset are converted to PUNCH_TIMEZONE first.
+"""
+
+import json
+import os
+import threading
+from datetime import datetime, timedelta
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+from database import create_punch_events_collection, normalize_employee_id
+
+PUNCH_TIMEZONE = os.environ.get('PUNCH_TIMEZONE', 'Asia/Kolkata')
+MAX_PUNCH_BATCH = int(os.environ.get('MAX_PUNCH_BATCH', '10000'))
+MAX_EVALUATE_DAYS = 93
+MAX_REPORTED_ERRORS = 100
+
+_punch_events_ready = False
+_punch_events_lock = threading.Lock()
+
+
+def parse_punch_batch(body, content_type):
+    """Decode a JSON array, {"events": [...]} or NDJSON body into raw event dicts."""
+    text = body.decode('utf-8') if isinstance(body, bytes) else body
+    if 'ndjson' in (content_type or ''):
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    payload = json.loads(text)
+    if isinstance(payload, dict):
+        payload = payload.get('events')
+    if not isinstance(payload, list):
+        raise ValueError('Expected a JSON array of events or {"events": [...]}')
+    return payload
+
+
+def _local_timestamp(value):
+    if not isinstance(value, str):
+        raise ValueError('timestamp must be an ISO 8601 string')
+    timestamp = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if timestamp.tzinfo is not None:
+        if ZoneInfo is None:
+            raise ValueError('timestamps with a UTC offset need Python 3.9+')
+        timestamp = timestamp.astimezone(ZoneInfo(PUNCH_TIMEZONE)).replace(tzinfo=None)
+    return timestamp
+
+
+def build_punch_docs(user_id, events):
+    """Validate raw events; returns (docs, errors) with errors as {index, error}."""
+    docs, errors = [], []
+    for index, event in enumerate(events):
+        try:
+            if not isinstance(event, dict):
+                raise ValueError('event must be an object')
+            employee_id = normalize_employee_id(event.get('employee_id'))
+            if employee_id in (None, ''):
+                raise ValueError('employee_id is required')
+            docs.append({
+                'timestamp': _local_timestamp(event.get('timestamp')),
+                'meta': {
+                    'user_id': user_id,
+                    'employee_id': employee_id,
+                    'device_id': str(event.get('device_id') or ''),
+                },
+            })
+        except ValueError as e:
+            errors.append({'index': index, 'error': str(e)})
+    return docs, errors
+
+
+def _ensure_punch_events(db):
+    """Create the punch_events time-series collection once per process.
+
+    init_db may run in the background or not at all (DB_INIT_ON_STARTUP=0),
+    and an insert into a missing collection would create a plain one.
+    """
+    global _punch_events_ready
+    if _punch_events_ready:
+        return
+    with _punch_events_lock:
+        if not _punch_events_ready:
+            create_punch_events_collection(db)
+            _punch_events_ready = True
+
+
+def insert_punch_events(db, docs):
+    if docs:
+        _ensure_punch_events(db)
+        db.punch_events.insert_many(docs, ordered=False)
+    return len(docs)
+
+
+def punch_query(user_id, date_from, date_to, employee_id=None):
+    """punch_events filter for an inclusive date range."""
+    query = {
+        'meta.user_id': user_id,
+        'timestamp': {
+            '$gte': datetime.combine(date_from, datetime.min.time()),
+            '$lt': datetime.combine(date_to + timedelta(days=1), datetime.min.time()),
+        },
+    }
+    if employee_id is not None:
+        query['meta.employee_id'] = normalize_employee_id(employee_id)
+    return query
+
+
+def load_punches(db, user_id, date_from, date_to, employee_id=None):
+    """Punch times grouped by (employee_id, date) for an inclusive date range.
+
+    Punches are kept at minute resolution, like device exports: re-sent
+    events and repeated taps within the same minute collapse into one punch.
+    """
+    days = {}
+    for event in db.punch_events.find(punch_query(user_id, date_from, date_to, employee_id), {'_id': 0, 'timestamp': 1, 'meta.employee_id': 1}):
+        timestamp = event['timestamp'].replace(second=0, microsecond=0)
+        days.setdefault((event['meta']['employee_id'], timestamp.date()), set()).add(timestamp)
+    return days
+
+
+def evaluate_punches(processor, days, date_from, date_to, selected_dates=None):
+    """Daily report and summary over a date range, from load_punches output.
+
+    Every employee with at least one punch in the range gets a row for every
+    date; dates without punches go through the normal Absent / admin-assigned
+    rules. Events carry no names, so employee_name is left empty.
+
+    Returns:
+        Tuple of (daily_report, monthly_summary) DataFrames
+    """
+    import pandas as pd
+
+    processor.selected_dates = selected_dates or []
+    # Numeric IDs first in numeric order, then any non-numeric ones.
+    employees = sorted({employee_id for employee_id, _ in days},
+                       key=lambda e: (isinstance(e, str), e))
+    dates = [date_from + timedelta(days=i) for i in range((date_to - date_from).days + 1)]
+
+    rows = []
+    for employee_id in employees:
+        for day in dates:
+            punches = sorted(days.get((employee_id, day), ()))
+            rows.append({
+                'employee_id': employee_id,
+                'employee_name': '',
+                'date': day,
+                # Same "HH:MM HH:MM" text a device export cell would hold.
+                'raw_punch_data': ' '.join(t.strftime('%H:%M') for t in punches),
+            })
+    if not rows:
+        return pd.DataFrame(), pd.DataFrame()
+
+    df_daily = processor.generate_daily_report(pd.DataFrame(rows))
+    return df_daily, processor.generate_monthly_summary(df_daily)
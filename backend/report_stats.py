@@ -0,0 +1,67 @@
+"""
+Report statistics materialized when a report is processed or saved.
+
+Pure Python over the report's row dicts, so saving a report does not need to
+import pandas. The numbers match what /api/statistics used to compute from a
+posted copy of the report.
+"""
+
+from collections import Counter
+
+PERCENTILES = (10, 25, 50, 75, 90)
+
+
+def _percentile(sorted_values, pct):
+    """Linear-interpolated percentile (same method as pandas' quantile)."""
+    if not sorted_values:
+        return 0.0
+    position = (len(sorted_values) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(sorted_values) - 1)
+    fraction = position - lower
+    return float(sorted_values[lower] + (sorted_values[upper] - sorted_values[lower]) * fraction)
+
+
+def _number(value):
+    try:
+        return float(value or 0)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def compute_report_statistics(daily_report, monthly_summary):
+    """Top performer, attendance rate, hours distribution and status counts."""
+    summary = list(monthly_summary or [])
+    daily = list(daily_report or [])
+
+    hours = sorted(_number(row.get('total_hours')) for row in summary)
+    present = sum(_number(row.get('present_days')) for row in summary)
+    absent = sum(_number(row.get('absent_days')) for row in summary)
+
+    top_performer = None
+    if summary:
+        top = max(summary, key=lambda row: _number(row.get('total_hours')))
+        top_performer = {
+            'employee_id': top.get('employee_id'),
+            'employee_name': top.get('employee_name'),
+            'total_hours': _number(top.get('total_hours')),
+            'total_hours_hm': top.get('total_hours_hm'),
+        }
+
+    distribution = {
+        'min': hours[0] if hours else 0.0,
+        'max': hours[-1] if hours else 0.0,
+        'mean': sum(hours) / len(hours) if hours else 0.0,
+        'median': _percentile(hours, 50),
+    }
+    for pct in PERCENTILES:
+        distribution[f'p{pct}'] = _percentile(hours, pct)
+
+    return {
+        'top_performer': top_performer,
+        'attendance_rate': float(present / (present + absent) * 100) if present + absent else 0.0,
+        'hours_distribution': distribution,
+        'status_counts': dict(Counter(row.get('status') or 'Unknown' for row in daily)),
+        'total_employees': len(summary),
+        'total_records': len(daily),
+    }
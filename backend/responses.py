@@ -0,0 +1,163 @@
+"""
+HTTP response helpers: strong ETags, conditional GET, fast JSON encoding and compression.
+"""
+
+import datetime
+import gzip
+import hashlib
+import json
+import os
+
+from flask import Response, current_app, request
+
+try:
+    import brotli
+except ImportError:  # optional dependency
+    brotli = None
+
+try:
+    import orjson
+except ImportError:  # optional dependency
+    orjson = None
+
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+COMPRESSIBLE_MIMETYPES = ('application/json', 'application/x-ndjson', 'text/plain', 'text/csv')
+
+# Suffix appended to the ETag of a compressed representation, so each encoding
+# has its own strong validator.
+_ENCODING_SUFFIX = {'br': '-br', 'gzip': '-gzip'}
+
+
+def make_etag(*parts):
+    """Derive an opaque strong ETag from version parts (ids, updated_at, ...)."""
+    digest = hashlib.sha256('\x1f'.join(str(p) for p in parts).encode()).hexdigest()
+    return digest[:32]
+
+
+def content_etag(body):
+    return hashlib.sha256(body).hexdigest()[:32]
+
+
+def is_not_modified(etag):
+    """True when the request's If-None-Match matches `etag` in any encoding."""
+    if request.method not in ('GET', 'HEAD'):
+        return False
+    candidates = [etag] + [etag + suffix for suffix in _ENCODING_SUFFIX.values()]
+    return any(request.if_none_match.contains(c) for c in candidates)
+
+
+def not_modified_response(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def json_response(payload, etag=None, status=200):
+    """Serialize `payload` with the app's JSON provider and attach a strong ETag.
+
+    Without an explicit `etag` the validator is a hash of the body. A GET whose
+    If-None-Match matches gets an empty 304 instead of the body.
+    """
+    body = current_app.json.dumps(payload).encode('utf-8')
+    return _json_body_response(body, etag, status)
+
+
+def spliced_json_response(payload, raw_fields, etag=None, status=200):
+    """json_response for a dict `payload` plus fields whose values are already
+    JSON-encoded bytes (e.g. rows read from a shared month file)."""
+    body = current_app.json.dumps(payload).encode('utf-8').rstrip()
+    extra = b','.join(json.dumps(key).encode('utf-8') + b':' + value for key, value in raw_fields.items())
+    if extra:
+        body = body[:-1].rstrip() + (b',' if payload else b'') + extra + b'}'
+    return _json_body_response(body, etag, status)
+
+
+def _json_body_response(body, etag, status):
+    if etag is None:
+        etag = content_etag(body)
+    if status == 200 and is_not_modified(etag):
+        return not_modified_response(etag)
+
+    response = Response(body, status=status, mimetype='application/json')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    response.vary.add('Authorization')
+    return response
+
+
+def _fast_default(value):
+    if hasattr(value, 'tolist'):  # numpy arrays and scalars
+        return value.tolist()
+    if isinstance(value, (datetime.date, datetime.datetime)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps_fast(payload):
+    """Serialize to bytes with orjson when installed, numpy arrays included."""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_fast_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, default=_fast_default, separators=(',', ':')).encode('utf-8')
+
+
+def dataframe_to_columns(df):
+    """Columnar encoding of a DataFrame: {column: [values...]}.
+
+    Numeric columns are passed through as numpy arrays (serialized natively by
+    orjson); everything else goes through tolist(). Dates come out as ISO
+    strings (YYYY-MM-DD) rather than the HTTP-date strings of the row format.
+    """
+    columns = {}
+    for name in df.columns:
+        values = df[name].to_numpy()
+        columns[str(name)] = values if values.dtype.kind in 'biuf' else values.tolist()
+    return columns
+
+
+def fast_json_response(payload, etag=None, status=200):
+    """Like json_response, but encoded with dumps_fast."""
+    return _json_body_response(dumps_fast(payload), etag, status)
+
+
+def _preferred_encoding():
+    accepted = request.accept_encodings
+    if brotli is not None and accepted['br']:
+        return 'br'
+    if accepted['gzip']:
+        return 'gzip'
+    return None
+
+
+def compress_response(response):
+    """after_request hook: gzip/brotli-encode large textual bodies."""
+    if (response.status_code != 200
+            or response.direct_passthrough
+            or response.is_streamed
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    data = response.get_data()
+    if len(data) < COMPRESS_MIN_BYTES:
+        return response
+
+    encoding = _preferred_encoding()
+    if encoding is None:
+        return response
+
+    if encoding == 'br':
+        compressed = brotli.compress(data, quality=5)
+    else:
+        compressed = gzip.compress(data, compresslevel=5)
+
+    response.set_data(compressed)
+    response.headers['Content-Encoding'] = encoding
+
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag + _ENCODING_SUFFIX[encoding])
+    return response
@@ -0,0 +1,208 @@
+"""
+Processed months shared between worker processes as memory-mapped Arrow IPC files.
+
+A month is written once as an uncompressed Arrow IPC file. Every worker opens
+it with pyarrow.memory_map, so the column buffers are read zero-copy from the
+OS page cache rather than copied into each worker's heap. A small SQLite
+registry (safe for concurrent processes) maps (user_id, year, month) to the
+current file.
+
+Each row is stored twice: typed columns for the NDJSON daily-records stream,
+and the report row's own JSON encoding for the report endpoints, which splice
+it into their response bodies without building Python dicts. Rows are written
+in daily_records order (employee_id, date), so both stores return a month in
+the same order.
+
+Enabled by setting SHARED_MONTHS_DIR; without it (or without pyarrow) the
+store is disabled and callers fall back to MongoDB.
+"""
+
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from daily_records import normalize_record_date, report_row_key
+from responses import dumps_fast
+
+SHARED_MONTHS_DIR = os.environ.get('SHARED_MONTHS_DIR', '')
+
+pa = None  # pyarrow, imported when a store is created (optional dependency)
+
+
+def _import_pyarrow():
+    global pa
+    if pa is None:
+        try:
+            import pyarrow
+        except ImportError:
+            raise ImportError("SharedMonthStore requires pyarrow (pip install pyarrow)")
+        pa = pyarrow
+    return pa
+
+
+def _month_schema():
+    # employee_id is a string column: normalize_employee_id keeps non-numeric
+    # IDs as strings, and Arrow cannot infer a column that mixes both.
+    return pa.schema([
+        ('employee_id', pa.string()),
+        ('employee_name', pa.string()),
+        ('date', pa.string()),
+        ('punch_count', pa.int64()),
+        ('punches', pa.string()),
+        ('worked_hours', pa.float64()),
+        ('hours_hm', pa.string()),
+        ('status', pa.string()),
+        ('row', pa.binary()),
+    ])
+
+
+def _month_row(row):
+    employee_id = row.get('employee_id')
+    return dict(row, employee_id=None if employee_id is None else str(employee_id),
+                date=normalize_record_date(row.get('date')), row=dumps_fast(row))
+
+
+def report_rows_json(table):
+    """The month's report rows as a JSON array (bytes)."""
+    return b'[' + b','.join(table.column('row').to_pylist()) + b']'
+
+
+class SharedMonthStore:
+    """Registry + Arrow IPC files for processed months."""
+
+    def __init__(self, root):
+        _import_pyarrow()
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._registry_path = str(self.root / 'registry.db')
+        self._local = threading.local()
+        self._opened = {}
+        self._opened_lock = threading.Lock()
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS months ('
+                ' user_id TEXT NOT NULL, year INTEGER NOT NULL, month INTEGER NOT NULL,'
+                ' path TEXT NOT NULL, rows INTEGER NOT NULL, published_at REAL NOT NULL,'
+                ' version TEXT, PRIMARY KEY (user_id, year, month))'
+            )
+            try:  # registries created before months were versioned
+                conn.execute('ALTER TABLE months ADD COLUMN version TEXT')
+            except sqlite3.OperationalError:
+                pass
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self._registry_path, timeout=10)
+            conn.execute('PRAGMA journal_mode=WAL')
+            self._local.conn = conn
+        return conn
+
+    def _user_dir(self, user_id):
+        return self.root / hashlib.sha1(str(user_id).encode()).hexdigest()[:16]
+
+    def publish(self, user_id, year, month, rows, version=None):
+        """Write `rows` (the month's daily_report) as the current file.
+
+        `version` is the report's updated_at; open_month can require it so a
+        file is never served for a newer report than the one it was built from.
+
+        If the month cannot be written, its previous file is unregistered so
+        readers fall back to MongoDB instead of serving a stale month.
+        """
+        try:
+            return self._publish(user_id, year, month, rows, version)
+        except Exception:
+            self.remove_month(user_id, year, month)
+            raise
+
+    def _publish(self, user_id, year, month, rows, version):
+        rows = sorted(rows, key=report_row_key)
+        table = pa.Table.from_pylist([_month_row(r) for r in rows], schema=_month_schema())
+        directory = self._user_dir(user_id)
+        directory.mkdir(parents=True, exist_ok=True)
+        path = directory / f"{year:04d}-{month:02d}-{time.time_ns()}.arrow"
+        tmp_path = path.with_suffix('.tmp')
+
+        with pa.OSFile(str(tmp_path), 'wb') as sink:
+            with pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        os.replace(tmp_path, path)
+
+        with self._connection() as conn:
+            previous = conn.execute(
+                'SELECT path FROM months WHERE user_id=? AND year=? AND month=?',
+                (str(user_id), year, month),
+            ).fetchone()
+            conn.execute(
+                'INSERT OR REPLACE INTO months (user_id, year, month, path, rows, published_at, version)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (str(user_id), year, month, str(path), table.num_rows, time.time(),
+                 None if version is None else str(version)),
+            )
+        # Workers that still have the old file mapped keep a valid mapping.
+        if previous and previous[0] != str(path):
+            Path(previous[0]).unlink(missing_ok=True)
+        return path
+
+    def remove_month(self, user_id, year, month):
+        with self._connection() as conn:
+            row = conn.execute(
+                'SELECT path FROM months WHERE user_id=? AND year=? AND month=?',
+                (str(user_id), year, month),
+            ).fetchone()
+            conn.execute('DELETE FROM months WHERE user_id=? AND year=? AND month=?',
+                         (str(user_id), year, month))
+        if row:
+            Path(row[0]).unlink(missing_ok=True)
+
+    def remove_user(self, user_id):
+        with self._connection() as conn:
+            paths = [r[0] for r in conn.execute('SELECT path FROM months WHERE user_id=?', (str(user_id),))]
+            conn.execute('DELETE FROM months WHERE user_id=?', (str(user_id),))
+        for path in paths:
+            Path(path).unlink(missing_ok=True)
+
+    def open_month(self, user_id, year, month, version=None):
+        """Return the month as a memory-mapped pyarrow Table, or None.
+
+        With `version`, None is also returned unless the file was published
+        for that report version.
+        """
+        row = self._connection().execute(
+            'SELECT path, version FROM months WHERE user_id=? AND year=? AND month=?',
+            (str(user_id), year, month),
+        ).fetchone()
+        if not row or (version is not None and row[1] != str(version)):
+            return None
+        path = row[0]
+        with self._opened_lock:
+            table = self._opened.get(path)
+            if table is None:
+                try:
+                    source = pa.memory_map(path, 'r')
+                except FileNotFoundError:
+                    return None
+                table = pa.ipc.open_file(source).read_all()
+                if not table.schema.equals(_month_schema()):
+                    return None  # written by an older version of this module
+                # Drop mappings of files this worker no longer needs.
+                for stale in [p for p in self._opened if not os.path.exists(p)]:
+                    del self._opened[stale]
+                self._opened[path] = table
+        return table
+
+
+def _create_store():
+    if not SHARED_MONTHS_DIR:
+        return None
+    try:
+        return SharedMonthStore(SHARED_MONTHS_DIR)
+    except ImportError:
+        return None
+
+
+shared_months = _create_store()
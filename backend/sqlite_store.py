@@ -0,0 +1,823 @@
+"""
+Embedded SQLite storage with the subset of the PyMongo API this backend uses.
+
+Selected with STORAGE_BACKEND=sqlite (see database.get_db). Each collection is
+a table named like its supabase_schema.sql counterpart:
+
+    CREATE TABLE attendance_reports (id TEXT PRIMARY KEY, doc TEXT NOT NULL)
+
+`doc` holds the document as JSON. The tables deliberately do not copy the
+typed columns of supabase_schema.sql: the API reads and writes MongoDB-shaped
+documents, several collections (users, daily_records, punch_events) have no
+Supabase table at all, and the large fields there (daily_report,
+monthly_summary, employees) are JSONB documents anyway. Filters and sorts compile to SQL over
+json_extract(doc, '$."field"'), and create_index() builds expression indexes
+on exactly those expressions, so the indexes made by database.init_db serve
+the same queries they do on MongoDB. Unique indexes raise DuplicateKeyError.
+
+The database runs in WAL mode. Connections come from a small pool shared by
+all threads (the dev server starts a thread per request), so each one keeps
+its PRAGMAs and its prepared-statement cache across requests; statements are
+parameterised so that cache is reused. Operations are
+reported to db_monitoring like MongoDB commands.
+
+Supported:
+    find / find_one (projection, sort, skip, limit), count_documents, distinct,
+    insert_one / insert_many, update_one / update_many ($set, $setOnInsert,
+    $unset, $inc, $push; upsert), replace_one, delete_one / delete_many,
+    bulk_write, create_index, and aggregate with $match, $project, $sort,
+    $unwind, $group, $skip, $limit and $count.
+    Query operators: $eq $ne $gt $gte $lt $lte $in $nin $exists $regex $type
+    $and $or $nor.
+"""
+
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError, DuplicateKeyError, OperationFailure
+from pymongo.results import (BulkWriteResult, DeleteResult, InsertManyResult, InsertOneResult,
+                             UpdateResult)
+
+from db_monitoring import filter_shape, is_slow, record_command
+
+SQLITE_BUSY_TIMEOUT = float(os.environ.get('SQLITE_BUSY_TIMEOUT', '10'))
+SQLITE_CACHED_STATEMENTS = 256
+# Idle connections kept for reuse; busier moments open extra ones.
+SQLITE_POOL_SIZE = int(os.environ.get('SQLITE_POOL_SIZE', '8'))
+
+_DATE_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+_IDENTIFIER = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*$')
+_MISSING = object()
+
+# $type aliases -> json_type() results
+_JSON_TYPES = {
+    'string': ('text',), 'int': ('integer',), 'long': ('integer',), 'double': ('real',),
+    'number': ('integer', 'real'), 'bool': ('true', 'false'), 'array': ('array',),
+    'object': ('object',), 'null': ('null',),
+}
+
+
+# --- JSON encoding ---------------------------------------------------------
+
+def _encode_default(value):
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        # Fixed-width text, so stored dates compare correctly as strings.
+        return {'$date': value.strftime(_DATE_FORMAT)}
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):  # numpy scalars
+        return value.item()
+    raise TypeError(f"Cannot store value of type {type(value).__name__}")
+
+
+def _dumps(value):
+    return json.dumps(value, default=_encode_default, separators=(',', ':'), ensure_ascii=False)
+
+
+def _decode_hook(obj):
+    if len(obj) == 1 and '$date' in obj:
+        return datetime.strptime(obj['$date'], _DATE_FORMAT)
+    return obj
+
+
+def _load_id(value):
+    return ObjectId(value) if ObjectId.is_valid(value) else value
+
+
+def _load_doc(row_id, text):
+    doc = {'_id': _load_id(row_id)}
+    doc.update(json.loads(text, object_hook=_decode_hook))
+    return doc
+
+
+def _param(value):
+    """Bind value for comparison against json_extract() output."""
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (datetime, dict, list)):
+        # json_extract returns objects/arrays as minified JSON text.
+        return _dumps(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return float(value)
+    if hasattr(value, 'item'):
+        return value.item()
+    return value
+
+
+# --- Document paths --------------------------------------------------------
+
+def _json_path(field):
+    parts = field.split('.')
+    for part in parts:
+        if not part or any(c in part for c in '"\'\\'):
+            raise ValueError(f"Unsupported field name: {field!r}")
+    return '$' + ''.join(f'."{part}"' for part in parts)
+
+
+def _field_sql(field):
+    if field == '_id':
+        return 'id'
+    return f"json_extract(doc, '{_json_path(field)}')"
+
+
+def _get(doc, field, default=None):
+    value = doc
+    for part in field.split('.'):
+        if not isinstance(value, dict) or part not in value:
+            return default
+        value = value[part]
+    return value
+
+
+def _set(doc, field, value):
+    parts = field.split('.')
+    for part in parts[:-1]:
+        doc = doc.setdefault(part, {})
+    doc[parts[-1]] = value
+
+
+def _unset(doc, field):
+    parts = field.split('.')
+    for part in parts[:-1]:
+        doc = doc.get(part)
+        if not isinstance(doc, dict):
+            return
+    doc.pop(parts[-1], None)
+
+
+def _project(doc, projection):
+    if not projection:
+        return doc
+    if isinstance(projection, (list, tuple)):
+        projection = {field: 1 for field in projection}
+    fields = {k: v for k, v in projection.items() if k != '_id'}
+    if fields and any(fields.values()):
+        out = {}
+        for field in fields:
+            value = _get(doc, field, _MISSING)
+            if value is not _MISSING:
+                _set(out, field, value)
+    else:
+        out = {k: v for k, v in doc.items() if k != '_id'}
+        for field in fields:
+            _unset(out, field)
+    if projection.get('_id', 1) and '_id' in doc:
+        out = {'_id': doc['_id'], **out}
+    return out
+
+
+def _sort_key(value):
+    """Python ordering of mixed values, following MongoDB's type order."""
+    if value is None or value is _MISSING:
+        return (0, 0)
+    if isinstance(value, bool):
+        return (5, value)
+    if isinstance(value, (int, float)):
+        return (1, value)
+    if isinstance(value, str):
+        return (2, value)
+    if isinstance(value, datetime):
+        return (6, value)
+    return (3, _dumps(value))
+
+
+def _sort_docs(docs, spec):
+    for field, direction in reversed(spec):
+        docs.sort(key=lambda d: _sort_key(_get(d, field)), reverse=direction < 0)
+    return docs
+
+
+def _sort_spec(key_or_list, direction=None):
+    if isinstance(key_or_list, str):
+        return [(key_or_list, direction or 1)]
+    if isinstance(key_or_list, dict):
+        return list(key_or_list.items())
+    return [(field, d) for field, d in key_or_list]
+
+
+# --- Filters ---------------------------------------------------------------
+
+def _prefix_range(pattern):
+    """Literal prefix of an anchored regex such as '^abc', or None."""
+    if not pattern.startswith('^') or not re.fullmatch(r'\^(?:[^\\.^$*+?()\[\]{}|]|\\.)+', pattern):
+        return None
+    return re.sub(r'\\(.)', r'\1', pattern[1:])
+
+
+def _regexp(pattern, value):
+    if value is None:
+        return False
+    return re.search(pattern, str(value)) is not None
+
+
+class _Compiler:
+    def __init__(self):
+        self.params = []
+
+    def where(self, spec):
+        clauses = []
+        for key, value in (spec or {}).items():
+            if key in ('$and', '$or', '$nor'):
+                subs = ['(' + self.where(item) + ')' for item in value]
+                if not subs:
+                    raise OperationFailure(f"{key} requires a non-empty array")
+                joined = (' AND ' if key == '$and' else ' OR ').join(subs)
+                clauses.append(f'NOT ({joined})' if key == '$nor' else f'({joined})')
+            elif key.startswith('$'):
+                raise OperationFailure(f"Unsupported top-level operator: {key}")
+            else:
+                clauses.append(self.field(key, value))
+        return ' AND '.join(clauses) or '1'
+
+    def field(self, field, cond):
+        expr = _field_sql(field)
+        if isinstance(cond, dict) and cond and all(k.startswith('$') for k in cond):
+            options = cond.get('$options', '')
+            return ' AND '.join(
+                self.operator(field, expr, op, operand, options)
+                for op, operand in cond.items() if op != '$options'
+            )
+        if isinstance(cond, re.Pattern):
+            return self.regex(expr, cond.pattern, 'i' if cond.flags & re.IGNORECASE else '')
+        return self.equals(expr, cond)
+
+    def bind(self, value):
+        self.params.append(_param(value))
+        return '?'
+
+    def equals(self, expr, value):
+        if value is None:
+            return f'{expr} IS NULL'
+        return f'{expr} = {self.bind(value)}'
+
+    def regex(self, expr, pattern, options):
+        clauses = []
+        prefix = _prefix_range(pattern) if 'i' not in options else None
+        if prefix:
+            # Range on the literal prefix lets an index serve anchored regexes.
+            clauses.append(f'{expr} >= {self.bind(prefix)} AND {expr} < {self.bind(prefix + chr(0x10FFFF))}')
+        if 'i' in options:
+            pattern = '(?i)' + pattern
+        clauses.append(f'{expr} REGEXP {self.bind(pattern)}')
+        return ' AND '.join(clauses)
+
+    def operator(self, field, expr, op, operand, options):
+        if op == '$eq':
+            return self.equals(expr, operand)
+        if op == '$ne':
+            if operand is None:
+                return f'{expr} IS NOT NULL'
+            return f'({expr} IS NULL OR {expr} != {self.bind(operand)})'
+        if op in ('$gt', '$gte', '$lt', '$lte'):
+            sql_op = {'$gt': '>', '$gte': '>=', '$lt': '<', '$lte': '<='}[op]
+            return f'{expr} {sql_op} {self.bind(operand)}'
+        if op in ('$in', '$nin'):
+            values = list(operand)
+            has_null = any(v is None for v in values)
+            values = [v for v in values if v is not None]
+            member = f"{expr} IN ({', '.join(self.bind(v) for v in values)})" if values else '0'
+            if op == '$in':
+                return f'({member} OR {expr} IS NULL)' if has_null else member
+            if has_null:
+                return f'({expr} IS NOT NULL AND NOT {member})'
+            return f'({expr} IS NULL OR NOT {member})'
+        if op == '$exists':
+            if field == '_id':
+                return '1' if operand else '0'
+            return f"json_type(doc, '{_json_path(field)}') IS {'NOT ' if operand else ''}NULL"
+        if op == '$regex':
+            pattern = operand.pattern if isinstance(operand, re.Pattern) else operand
+            return self.regex(expr, pattern, options)
+        if op == '$type':
+            names = operand if isinstance(operand, (list, tuple)) else [operand]
+            types = [t for name in names for t in _JSON_TYPES.get(name, ())]
+            if not types:
+                raise OperationFailure(f"Unsupported $type: {operand!r}")
+            return f"json_type(doc, '{_json_path(field)}') IN ({', '.join(self.bind(t) for t in types)})"
+        raise OperationFailure(f"Unsupported query operator: {op}")
+
+
+def _compile(spec):
+    compiler = _Compiler()
+    return compiler.where(spec), compiler.params
+
+
+# --- Updates ---------------------------------------------------------------
+
+def _apply_update(doc, update, inserting=False):
+    if not any(k.startswith('$') for k in update):
+        # Replacement document
+        return {'_id': doc.get('_id'), **{k: v for k, v in update.items() if k != '_id'}}
+    for op, fields in update.items():
+        if op == '$set' or (op == '$setOnInsert' and inserting):
+            for field, value in fields.items():
+                _set(doc, field, value)
+        elif op == '$setOnInsert':
+            continue
+        elif op == '$unset':
+            for field in fields:
+                _unset(doc, field)
+        elif op == '$inc':
+            for field, amount in fields.items():
+                _set(doc, field, (_get(doc, field) or 0) + amount)
+        elif op == '$push':
+            for field, value in fields.items():
+                current = _get(doc, field)
+                items = list(current) if isinstance(current, list) else []
+                if isinstance(value, dict) and '$each' in value:
+                    items.extend(value['$each'])
+                else:
+                    items.append(value)
+                _set(doc, field, items)
+        else:
+            raise OperationFailure(f"Unsupported update operator: {op}")
+    return doc
+
+
+def _upsert_seed(spec):
+    """Equality fields of a filter, used as the base of an upserted document."""
+    seed = {}
+    for key, value in (spec or {}).items():
+        if key.startswith('$'):
+            continue
+        if isinstance(value, dict) and value and all(k.startswith('$') for k in value):
+            if '$eq' in value:
+                _set(seed, key, value['$eq'])
+            continue
+        _set(seed, key, value)
+    return seed
+
+
+# --- Aggregation -----------------------------------------------------------
+
+def _operand(doc, expr):
+    if isinstance(expr, str) and expr.startswith('$'):
+        return _get(doc, expr[1:])
+    if isinstance(expr, dict):
+        return {k: _operand(doc, v) for k, v in expr.items()}
+    return expr
+
+
+def _freeze(value):
+    return _dumps(value) if isinstance(value, (dict, list)) else value
+
+
+def _group(docs, spec):
+    groups = {}
+    accumulators = {k: v for k, v in spec.items() if k != '_id'}
+    for doc in docs:
+        key = _operand(doc, spec['_id'])
+        state = groups.get(_freeze(key))
+        if state is None:
+            state = groups[_freeze(key)] = {'_id': key, '_counts': {}}
+        for name, acc in accumulators.items():
+            (op, expr), = acc.items()
+            value = _operand(doc, expr)
+            numeric = isinstance(value, (int, float)) and not isinstance(value, bool)
+            if op == '$sum':
+                state[name] = state.get(name, 0) + (value if numeric else 0)
+            elif op == '$avg':
+                if numeric:
+                    state[name] = state.get(name, 0) + value
+                    state['_counts'][name] = state['_counts'].get(name, 0) + 1
+            elif op in ('$min', '$max'):
+                if value is not None:
+                    current = state.get(name)
+                    better = (_sort_key(value) < _sort_key(current)) if op == '$min' else (_sort_key(value) > _sort_key(current))
+                    if current is None or better:
+                        state[name] = value
+            elif op == '$first':
+                state.setdefault(name, value)
+            elif op == '$last':
+                state[name] = value
+            elif op == '$push':
+                state.setdefault(name, []).append(value)
+            elif op == '$addToSet':
+                items = state.setdefault(name, [])
+                if value not in items:
+                    items.append(value)
+            else:
+                raise OperationFailure(f"Unsupported accumulator: {op}")
+
+    results = []
+    for state in groups.values():
+        counts = state.pop('_counts')
+        for name, acc in accumulators.items():
+            if '$avg' in acc:
+                state[name] = state[name] / counts[name] if counts.get(name) else None
+            state.setdefault(name, None)
+        results.append(state)
+    return results
+
+
+def _unwind(docs, spec):
+    path = (spec['path'] if isinstance(spec, dict) else spec)[1:]
+    for doc in docs:
+        values = _get(doc, path)
+        if isinstance(values, list):
+            for value in values:
+                out = dict(doc)
+                _set(out, path, value)
+                yield out
+        elif values is not None:
+            yield doc
+
+
+# --- Collections -----------------------------------------------------------
+
+class Cursor:
+    """Lazy result of Collection.find(); iterate it or chain sort/skip/limit."""
+
+    def __init__(self, collection, spec, projection, sort=None, skip=0, limit=0):
+        self._collection = collection
+        self._spec = spec
+        self._projection = projection
+        self._sort = _sort_spec(sort) if sort else []
+        self._skip = skip
+        self._limit = limit
+        self._rows = None
+        self._conn = None
+
+    def sort(self, key_or_list, direction=None):
+        self._sort = _sort_spec(key_or_list, direction)
+        return self
+
+    def skip(self, count):
+        self._skip = count
+        return self
+
+    def limit(self, count):
+        self._limit = count
+        return self
+
+    def _sql(self):
+        where, params = _compile(self._spec)
+        sql = f'SELECT id, doc FROM "{self._collection.name}" WHERE {where}'
+        if self._sort:
+            sql += ' ORDER BY ' + ', '.join(
+                f"{_field_sql(field)} {'DESC' if direction < 0 else 'ASC'}" for field, direction in self._sort
+            )
+        if self._limit or self._skip:
+            sql += ' LIMIT ? OFFSET ?'
+            params += [self._limit or -1, self._skip]
+        return sql, params
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._rows is None:
+            sql, params = self._sql()
+            with self._collection._timed('find', self._spec):
+                self._collection.database._ensure_table(self._collection.name)
+                # The connection stays checked out until the cursor is closed.
+                self._conn = self._collection.database.acquire()
+                try:
+                    self._rows = self._conn.execute(sql, params)
+                except BaseException:
+                    self.close()
+                    raise
+        row = self._rows.fetchone()
+        if row is None:
+            self.close()
+            raise StopIteration
+        return _project(_load_doc(*row), self._projection)
+
+    def close(self):
+        if self._rows is not None:
+            self._rows.close()
+        self._rows = _Exhausted()
+        if self._conn is not None:
+            self._collection.database.release(self._conn)
+            self._conn = None
+
+
+class _Exhausted:
+    def fetchone(self):
+        return None
+
+    def close(self):
+        pass
+
+
+class Collection:
+    def __init__(self, database, name):
+        self.database = database
+        self.name = name
+
+    def _fetchone(self, sql, params=()):
+        self.database._ensure_table(self.name)
+        with self.database.connection() as conn:
+            return conn.execute(sql, params).fetchone()
+
+    @contextmanager
+    def _timed(self, command, spec=None):
+        """Report the operation to db_monitoring like a MongoDB command."""
+        start = time.perf_counter()
+        failed = True
+        try:
+            yield
+            failed = False
+        finally:
+            seconds = time.perf_counter() - start
+            record_command(self.name, command, seconds, failed,
+                           filter_shape(spec) if spec is not None and is_slow(seconds) else None)
+
+    @contextmanager
+    def _write(self):
+        self.database._ensure_table(self.name)
+        with self.database.connection() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                yield conn
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            conn.execute('COMMIT')
+
+    # Reads
+
+    def find(self, filter=None, projection=None, sort=None, skip=0, limit=0, batch_size=None):
+        return Cursor(self, filter, projection, sort, skip, limit)
+
+    def find_one(self, filter=None, projection=None, sort=None):
+        if filter is not None and not isinstance(filter, dict):
+            filter = {'_id': filter}
+        cursor = self.find(filter, projection, sort=sort, limit=1)
+        try:
+            return next(cursor, None)
+        finally:
+            cursor.close()
+
+    def count_documents(self, filter, limit=None, skip=None):
+        where, params = _compile(filter)
+        sql = f'SELECT COUNT(*) FROM (SELECT 1 FROM "{self.name}" WHERE {where} LIMIT ? OFFSET ?)'
+        with self._timed('count', filter):
+            return self._fetchone(sql, params + [limit or -1, skip or 0])[0]
+
+    def distinct(self, key, filter=None):
+        values = []
+        for doc in self.find(filter, {key: 1}):
+            value = _get(doc, key, _MISSING)
+            for item in (value if isinstance(value, list) else [value]):
+                if item is not _MISSING and item not in values:
+                    values.append(item)
+        return values
+
+    def aggregate(self, pipeline, **kwargs):
+        stages = list(pipeline)
+        spec = stages.pop(0)['$match'] if stages and '$match' in stages[0] else {}
+        docs = list(self.find(spec))
+        for stage in stages:
+            (name, arg), = stage.items()
+            if name == '$project':
+                docs = [_project(d, arg) for d in docs]
+            elif name == '$sort':
+                docs = _sort_docs(docs, _sort_spec(arg))
+            elif name == '$unwind':
+                docs = list(_unwind(docs, arg))
+            elif name == '$group':
+                docs = _group(docs, arg)
+            elif name == '$skip':
+                docs = docs[arg:]
+            elif name == '$limit':
+                docs = docs[:arg]
+            elif name == '$count':
+                docs = [{arg: len(docs)}] if docs else []
+            else:
+                raise OperationFailure(f"Unsupported aggregation stage: {name}")
+        return iter(docs)
+
+    # Writes
+
+    def _insert(self, conn, doc):
+        if '_id' not in doc:
+            doc['_id'] = ObjectId()
+        body = {k: v for k, v in doc.items() if k != '_id'}
+        try:
+            conn.execute(f'INSERT INTO "{self.name}" (id, doc) VALUES (?, ?)', (str(doc['_id']), _dumps(body)))
+        except sqlite3.IntegrityError as e:
+            raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})", 11000)
+        return doc['_id']
+
+    def insert_one(self, document):
+        with self._timed('insert'), self._write() as conn:
+            return InsertOneResult(self._insert(conn, document), True)
+
+    def insert_many(self, documents, ordered=True):
+        inserted, errors = [], []
+        with self._timed('insert'), self._write() as conn:
+            for index, doc in enumerate(documents):
+                try:
+                    inserted.append(self._insert(conn, doc))
+                except DuplicateKeyError as e:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': str(e)})
+                    if ordered:
+                        break
+        if errors:
+            raise BulkWriteError({'writeErrors': errors, 'nInserted': len(inserted), 'nUpserted': 0,
+                                  'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []})
+        return InsertManyResult(inserted, True)
+
+    def _update(self, conn, filter, update, upsert, multi):
+        where, params = _compile(filter)
+        sql = f'SELECT id, doc FROM "{self.name}" WHERE {where}' + ('' if multi else ' LIMIT 1')
+        rows = conn.execute(sql, params).fetchall()
+        modified = 0
+        for row_id, text in rows:
+            doc = _load_doc(row_id, text)
+            updated = _apply_update(_load_doc(row_id, text), update)
+            if updated != doc:
+                body = {k: v for k, v in updated.items() if k != '_id'}
+                try:
+                    conn.execute(f'UPDATE "{self.name}" SET doc = ? WHERE id = ?', (_dumps(body), row_id))
+                except sqlite3.IntegrityError as e:
+                    raise DuplicateKeyError(f"E11000 duplicate key error collection: {self.name} ({e})", 11000)
+                modified += 1
+        if rows or not upsert:
+            return {'n': len(rows), 'nModified': modified}
+        doc = _apply_update(_upsert_seed(filter), update, inserting=True)
+        return {'n': 1, 'nModified': 0, 'upserted': self._insert(conn, doc)}
+
+    def update_one(self, filter, update, upsert=False):
+        with self._timed('update', filter), self._write() as conn:
+            return UpdateResult(self._update(conn, filter, update, upsert, multi=False), True)
+
+    def update_many(self, filter, update, upsert=False):
+        with self._timed('update', filter), self._write() as conn:
+            return UpdateResult(self._update(conn, filter, update, upsert, multi=True), True)
+
+    def replace_one(self, filter, replacement, upsert=False):
+        return self.update_one(filter, replacement, upsert=upsert)
+
+    def _delete(self, conn, filter, multi):
+        where, params = _compile(filter)
+        if not multi:
+            where = f'id IN (SELECT id FROM "{self.name}" WHERE {where} LIMIT 1)'
+        return conn.execute(f'DELETE FROM "{self.name}" WHERE {where}', params).rowcount
+
+    def delete_one(self, filter):
+        with self._timed('delete', filter), self._write() as conn:
+            return DeleteResult({'n': self._delete(conn, filter, multi=False)}, True)
+
+    def delete_many(self, filter):
+        with self._timed('delete', filter), self._write() as conn:
+            return DeleteResult({'n': self._delete(conn, filter, multi=True)}, True)
+
+    def bulk_write(self, requests, ordered=True):
+        """Apply pymongo InsertOne/UpdateOne/UpdateMany/ReplaceOne/DeleteOne/DeleteMany ops."""
+        totals = {'nInserted': 0, 'nUpserted': 0, 'nMatched': 0, 'nModified': 0, 'nRemoved': 0, 'upserted': []}
+        errors = []
+        with self._timed('bulkWrite'), self._write() as conn:
+            for index, op in enumerate(requests):
+                kind = type(op).__name__
+                try:
+                    if kind == 'InsertOne':
+                        self._insert(conn, op._doc)
+                        totals['nInserted'] += 1
+                    elif kind in ('UpdateOne', 'UpdateMany', 'ReplaceOne'):
+                        raw = self._update(conn, op._filter, op._doc, bool(op._upsert), multi=kind == 'UpdateMany')
+                        if 'upserted' in raw:
+                            totals['nUpserted'] += 1
+                            totals['upserted'].append({'index': index, '_id': raw['upserted']})
+                        else:
+                            totals['nMatched'] += raw['n']
+                            totals['nModified'] += raw['nModified']
+                    elif kind in ('DeleteOne', 'DeleteMany'):
+                        totals['nRemoved'] += self._delete(conn, op._filter, multi=kind == 'DeleteMany')
+                    else:
+                        raise OperationFailure(f"Unsupported bulk operation: {kind}")
+                except DuplicateKeyError as e:
+                    errors.append({'index': index, 'code': 11000, 'errmsg': str(e)})
+                    if ordered:
+                        break
+        if errors:
+            totals['writeErrors'] = errors
+            raise BulkWriteError(totals)
+        return BulkWriteResult(totals, True)
+
+    # Schema
+
+    def create_index(self, keys, unique=False, name=None, **kwargs):
+        keys = _sort_spec(keys)
+        if name is None:
+            name = '_'.join(f"{field}_{direction}" for field, direction in keys)
+        index_name = re.sub(r'[^A-Za-z0-9_]', '_', f'ix_{self.name}_{name}')
+        columns = ', '.join(
+            f"{_field_sql(field)} {'DESC' if direction == -1 else 'ASC'}" for field, direction in keys
+        )
+        self.database._ensure_table(self.name)
+        with self.database._schema_lock, self.database.connection() as conn:
+            conn.execute(
+                f'CREATE {"UNIQUE " if unique else ""}INDEX IF NOT EXISTS "{index_name}" '
+                f'ON "{self.name}" ({columns})'
+            )
+        return name
+
+    def drop(self):
+        with self.database._schema_lock, self.database.connection() as conn:
+            conn.execute(f'DROP TABLE IF EXISTS "{self.name}"')
+            self.database._tables.discard(self.name)
+
+
+class SqliteDatabase:
+    """Drop-in for a pymongo Database: db.<collection> / db['<collection>']."""
+
+    def __init__(self, path):
+        self.path = path
+        self.name = os.path.splitext(os.path.basename(path))[0]
+        self._idle = []
+        self._pool_lock = threading.Lock()
+        self._tables = set()
+        self._schema_lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connect(self):
+        # Used by one thread at a time, but not always the one that opened it.
+        conn = sqlite3.connect(self.path, timeout=SQLITE_BUSY_TIMEOUT, isolation_level=None,
+                               cached_statements=SQLITE_CACHED_STATEMENTS, check_same_thread=False)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        conn.create_function('regexp', 2, _regexp, deterministic=True)
+        return conn
+
+    def acquire(self):
+        """Check out a pooled connection (a new one if none is idle)."""
+        with self._pool_lock:
+            if self._idle:
+                return self._idle.pop()
+        return self._connect()
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        with self._pool_lock:
+            if len(self._idle) < SQLITE_POOL_SIZE:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def _ensure_table(self, name):
+        if name in self._tables:
+            return
+        if not _IDENTIFIER.match(name):
+            raise ValueError(f"Invalid collection name: {name!r}")
+        with self._schema_lock, self.connection() as conn:
+            conn.execute(
+                f'CREATE TABLE IF NOT EXISTS "{name}" (id TEXT PRIMARY KEY, doc TEXT NOT NULL)'
+            )
+            self._tables.add(name)
+
+    def __getitem__(self, name):
+        return Collection(self, name)
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return Collection(self, name)
+
+    def list_collection_names(self):
+        with self.connection() as conn:
+            rows = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def create_collection(self, name, **options):
+        """Create the table; MongoDB-only options (e.g. timeseries) are ignored."""
+        self._ensure_table(name)
+        return self[name]
+
+    def command(self, name, *args, **kwargs):
+        if name != 'ping':
+            raise OperationFailure(f"Unsupported command: {name}")
+        with self.connection() as conn:
+            conn.execute('SELECT 1').fetchone()
+        return {'ok': 1.0}
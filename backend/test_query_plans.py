@@ -0,0 +1,169 @@
+"""
+Query Plan Tests - Attendance Processing System
+Runs explain() on the query shapes of the API endpoints and fails if any of
+them needs a collection scan or an in-memory sort. Filters, sorts and
+pipelines are built with the same helpers the handlers use, so the checked
+shapes cannot drift from the real ones.
+
+Needs a local mongod (never production); the tests are skipped when none
+answers:
+    PLAN_CHECK_MONGODB_URI=mongodb://localhost:27017 python -m pytest test_query_plans.py
+"""
+
+import os
+from datetime import date
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import PyMongoError
+
+from analytics import range_totals_pipeline
+from daily_records import build_daily_record_query, employee_calendar_query, stored_days_filter
+from database import init_db
+from punches import punch_query
+
+PLAN_CHECK_MONGODB_URI = os.environ.get('PLAN_CHECK_MONGODB_URI', 'mongodb://localhost:27017')
+PLAN_CHECK_DB_NAME = 'attendance_plan_check'
+
+SAMPLE_USER = '000000000000000000000000'
+YEAR, MONTH = 2025, 12
+
+BAD_STAGES = {'COLLSCAN', 'SORT'}
+
+
+def _daily_records(args):
+    return build_daily_record_query(SAMPLE_USER, YEAR, MONTH, args)
+
+
+def _find(collection, query, sort=None):
+    command = {'find': collection, 'filter': query}
+    if sort:
+        command['sort'] = dict(sort)
+    return command
+
+
+def _count(collection, query):
+    return {'count': collection, 'query': query}
+
+
+def _aggregate(collection, pipeline):
+    return {'aggregate': collection, 'pipeline': pipeline, 'cursor': {}}
+
+
+_analytics_pipeline = range_totals_pipeline(SAMPLE_USER, (2025, 10), (2026, 3))
+
+# (endpoint, explain command) -- built from the helpers api.py uses.
+ENDPOINT_QUERIES = [
+    ('GET attendance-reports (month)',
+     _find('attendance_reports', {'user_id': SAMPLE_USER, 'year': YEAR, 'month': MONTH})),
+    ('GET attendance-reports (list)',
+     _find('attendance_reports', {'user_id': SAMPLE_USER}, [('updated_at', -1)])),
+    ('GET last-process-result',
+     _find('attendance_reports', {'user_id': SAMPLE_USER}, [('updated_at', -1)])),
+    ('GET daily-records/stream',
+     _find('daily_records', {'user_id': SAMPLE_USER, 'year': YEAR, 'month': MONTH},
+           [('employee_id', 1), ('date', 1)])),
+    ('GET daily-records',
+     _find('daily_records', *_daily_records({}))),
+    ('GET daily-records (count)',
+     _count('daily_records', _daily_records({})[0])),
+    ('GET daily-records (employee)',
+     _find('daily_records', *_daily_records({'employee_id': '35'}))),
+    ('GET daily-records (status)',
+     _find('daily_records', *_daily_records({'status': 'Absent'}))),
+    ('GET daily-records (status, count)',
+     _count('daily_records', _daily_records({'status': 'Absent'})[0])),
+    ('GET daily-records (name prefix)',
+     _find('daily_records', *_daily_records({'name': 'ris'}))),
+    ('GET daily-records (name prefix, sort=employee_name)',
+     _find('daily_records', *_daily_records({'name': 'ris', 'sort': 'employee_name'}))),
+    ('GET daily-records (date range)',
+     _find('daily_records', *_daily_records({'date_from': '2025-12-01', 'date_to': '2025-12-15'}))),
+    ('GET daily-records (by hours)',
+     _find('daily_records', *_daily_records({'sort': '-worked_hours'}))),
+    ('GET employees/<id>/calendar',
+     _find('daily_records', *employee_calendar_query(SAMPLE_USER, '35', (YEAR, MONTH), (YEAR, MONTH)))),
+    ('GET employees/<id>/calendar (range)',
+     _find('daily_records', *employee_calendar_query(SAMPLE_USER, '35', (2025, 11), (2026, 2)))),
+    ('POST process/delta (stored days)',
+     _find('daily_records', stored_days_filter(SAMPLE_USER, YEAR, MONTH, {'2025-12-15', '2025-12-16'}))),
+    # Only the stages that read the collection; the final $sort runs on the
+    # $group output and is in memory by nature.
+    ('GET analytics/range (totals)',
+     _aggregate('attendance_reports', _analytics_pipeline[:3])),
+    ('GET analytics/range (months)',
+     _find('attendance_reports', _analytics_pipeline[0]['$match'], [('year', 1), ('month', 1)])),
+    ('GET punches/report',
+     _find('punch_events', punch_query(SAMPLE_USER, date(2025, 12, 1), date(2025, 12, 31)))),
+    ('GET punches/report (employee)',
+     _find('punch_events', punch_query(SAMPLE_USER, date(2025, 12, 1), date(2025, 12, 31), '35'))),
+    ('GET manual-users',
+     _find('manual_users', {'user_id': SAMPLE_USER}, [('created_at', 1)])),
+    ('POST manual-user-daily-records',
+     _find('manual_users', {'user_id': SAMPLE_USER, 'employee_id': 35})),
+    ('GET finalized-salaries',
+     _find('finalized_salaries', {'user_id': SAMPLE_USER}, [('finalized_at', -1)])),
+    ('GET confirmed-salaries',
+     _find('confirmed_salaries', {'user_id': SAMPLE_USER}, [('confirmed_at', -1)])),
+    ('GET hour-rates',
+     _find('hour_rates', {'user_id': SAMPLE_USER})),
+    ('POST hour-rates',
+     _find('hour_rates', {'user_id': SAMPLE_USER, 'employee_id': 35})),
+    ('POST auth/login',
+     _find('users', {'email': 'someone@example.com', 'password_hash': 'x'})),
+    ('GET auth/me',
+     _find('users', {'_id': ObjectId(SAMPLE_USER)})),
+]
+
+
+def plan_stages(plan):
+    """Yield every stage name in a winning plan tree."""
+    if not isinstance(plan, dict):
+        return
+    if 'stage' in plan:
+        yield plan['stage']
+    for key in ('inputStage', 'queryPlan'):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from plan_stages(child)
+
+
+def winning_plans(explanation):
+    """Every winningPlan in an explain result (find, count or aggregate,
+    including the bucket plans of time-series collections)."""
+    if isinstance(explanation, dict):
+        for key, value in explanation.items():
+            if key == 'winningPlan':
+                yield value
+            else:
+                yield from winning_plans(value)
+    elif isinstance(explanation, list):
+        for item in explanation:
+            yield from winning_plans(item)
+
+
+@pytest.fixture(scope='module')
+def db():
+    client = MongoClient(PLAN_CHECK_MONGODB_URI, serverSelectionTimeoutMS=1000)
+    try:
+        client.admin.command('ping')
+    except PyMongoError:
+        pytest.skip(f'no mongod at {PLAN_CHECK_MONGODB_URI}')
+    client.drop_database(PLAN_CHECK_DB_NAME)
+    database = client[PLAN_CHECK_DB_NAME]
+    init_db(database)
+    yield database
+    client.drop_database(PLAN_CHECK_DB_NAME)
+    client.close()
+
+
+@pytest.mark.parametrize('endpoint,command', ENDPOINT_QUERIES, ids=[e for e, _ in ENDPOINT_QUERIES])
+def test_endpoint_query_uses_index(db, endpoint, command):
+    explanation = db.command('explain', command, verbosity='queryPlanner')
+    plans = list(winning_plans(explanation))
+    assert plans, f'{endpoint}: no winning plan in explain output'
+    stages = [stage for plan in plans for stage in plan_stages(plan)]
+    bad = BAD_STAGES.intersection(stages)
+    assert not bad, f"{endpoint} needs {', '.join(sorted(bad))}: {' -> '.join(stages)}"